@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+from sys import argv, stdout
+from typing import Callable, NamedTuple
+
+from fcalc import (Building, Demand, Ingredient, Logistics, Recipe,
+                   RecipeGraph, Subfactories, calculate, print_totals, secs)
+from exact import exact_graph
+from pack import PACKS, load_pack
+
+ASSEMBLER = Building('assembler', 1, slots=4, power=0.15)
+# Time and lines may drift this much before a comparison flags a case.
+TOLERANCE = 1.2
+MIN_REGRESSION = 1e-3  # Seconds; below this it's noise.
+
+
+class Case(NamedTuple):
+  name: str
+  recipes: dict[str, Recipe]
+  raws: set[str]
+  demands: list[Demand]
+  exact: bool = False
+
+
+def synthetic(items: int = 200,
+              fan_in: int = 3,
+              depth: int = 8,
+              shared: float = 0.5,
+              side_outputs: float = 0.,
+              cycles: int = 0,
+              seed: int = 0) -> Case:
+  # Items are laid out in layers above a layer of raws, and each recipe takes
+  # fan_in ingredients from the layers below. shared is the chance that an
+  # ingredient reuses one some other recipe already takes; cycles adds that
+  # many ingredients taken from a higher layer instead.
+  rng = random.Random(seed)
+  raws = [f'raw{i}' for i in range(max(2, items // 20))]
+  layers = [raws] + [[] for _ in range(depth)]
+  for i in range(items):
+    layers[1 + i * depth // items].append(f'item{i}')
+  used: list[str] = []
+  recipes: dict[str, Recipe] = {}
+  for level in range(1, depth + 1):
+    below = [n for layer in layers[:level] for n in layer]
+    for name in layers[level]:
+      if used and rng.random() < shared:
+        pool = used
+      else:
+        pool = layers[level - 1]
+      inputs = set(rng.sample(pool, min(fan_in, len(pool))))
+      if len(inputs) < fan_in:
+        inputs.update(rng.sample(below, min(fan_in, len(below)) - len(inputs)))
+      used.extend(sorted(inputs.difference(used)))
+      extras = []
+      if rng.random() < side_outputs:
+        extras = [Ingredient(rng.choice(below), rng.randint(1, 3))]
+      recipes[name] = Recipe(
+          name, ASSEMBLER, rng.randint(1, 4), secs(rng.uniform(0.5, 10)),
+          [Ingredient(n, rng.randint(1, 5)) for n in sorted(inputs)], extras)
+  # A cycle feeds a little of an item back into a recipe somewhere below it.
+  crafted = [n for layer in layers[2:] for n in layer]
+  for _ in range(cycles if crafted else 0):
+    top = item = rng.choice(crafted)
+    while True:
+      below = [i.name for i in recipes[item].ingredients if i.name in recipes]
+      if not below:
+        break
+      item = rng.choice(below)
+    if item != top:
+      recipe = recipes[item]
+      recipes[item] = recipe._replace(ingredients=recipe.ingredients +
+                                      [Ingredient(top, 0.01)])
+  name = (f'dag{items}-f{fan_in}-d{depth}-s{shared:g}-o{side_outputs:g}'
+          f'-c{cycles}')
+  return Case(name, recipes, set(raws),
+              [Demand(n, 1) for n in layers[depth]])
+
+
+def pack_case(name: str, exact: bool = False) -> Case:
+  pack = load_pack(os.path.join(PACKS, f'{name}.toml'))
+  if not exact:
+    return Case(name, pack.graph.recipes, pack.graph.raws, pack.demands)
+  graph, demands = exact_graph(pack.graph, pack.demands)
+  return Case(f'{name}-exact', graph.recipes, graph.raws, demands, True)
+
+
+class LineCounter:
+
+  def __init__(self):
+    self.lines = 0
+
+  def write(self, text: str):
+    self.lines += text.count('\n')
+
+
+def measure(run: Callable[[LineCounter], None], repeat: int) -> dict:
+  # An untimed run first, so lazy imports such as numpy's aren't timed.
+  run(LineCounter())
+  best = float('inf')
+  for _ in range(repeat):
+    counter = LineCounter()
+    start = time.perf_counter()
+    run(counter)
+    best = min(best, time.perf_counter() - start)
+  # Tracing slows everything down, so peak memory gets a run of its own.
+  tracemalloc.start()
+  run(LineCounter())
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return {'seconds': best, 'peak_bytes': peak, 'lines': counter.lines}
+
+
+def engines(case: Case) -> dict[str, Callable[[LineCounter], None]]:
+  # Every run compiles its own graph, as a fresh process would.
+  logistics = Logistics()
+
+  def tree(output: LineCounter):
+    calculate(RecipeGraph(case.recipes, case.raws, case.exact), case.demands,
+              output, logistics)
+
+  def matrix(output: LineCounter):
+    calculate(RecipeGraph(case.recipes, case.raws), case.demands, output,
+              logistics, 'matrix')
+
+  graph = RecipeGraph(case.recipes, case.raws, case.exact)
+  try:
+    totals = Subfactories(graph, case.demands).totals()
+  except ValueError:
+    return {'matrix': matrix}  # Only the matrix solver takes cycles.
+  runs = {
+      'tree': tree,
+      'matrix': matrix,
+      'totals': lambda output: print_totals(graph, totals, output),
+  }
+  if case.exact:
+    del runs['matrix']  # The matrix solver is floats only.
+  return runs
+
+
+def benchmark(cases: list[Case], repeat: int) -> dict:
+  results = {}
+  for case in cases:
+    results[case.name] = {
+        engine: measure(run, repeat)
+        for engine, run in engines(case).items()
+    }
+  return results
+
+
+def print_results(results: dict, baseline: dict, output):
+  for case, runs in results.items():
+    for engine, r in runs.items():
+      output.write(f"{case:40} {engine:7} {r['seconds'] * 1e3: 9.2f}ms "
+                   f"{r['peak_bytes'] / 2**20: 8.2f}MiB {r['lines']: 7} lines")
+      before = baseline.get(case, {}).get(engine)
+      if before:
+        ratio = r['seconds'] / before['seconds']
+        output.write(f" {ratio: 5.2f}x")
+        slower = (ratio > TOLERANCE and
+                  r['seconds'] - before['seconds'] > MIN_REGRESSION)
+        if slower or r['lines'] != before['lines']:
+          output.write(" REGRESSION")
+      output.write("\n")
+
+
+def main(args: list[str]):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--items', type=int, nargs='*', default=[100, 1000])
+  parser.add_argument('--fan-in', type=int, default=3)
+  parser.add_argument('--depth', type=int, default=8)
+  parser.add_argument('--shared', type=float, default=0.5)
+  parser.add_argument('--side-outputs', type=float, default=0.1)
+  parser.add_argument('--cycles', type=int, default=0)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--repeat', type=int, default=5)
+  parser.add_argument('--no-packs',
+                      action='store_true',
+                      help='Skip the base and bobs packs')
+  parser.add_argument('--save', metavar='JSON', help='Write a baseline')
+  parser.add_argument('--compare', metavar='JSON', help='Compare to a baseline')
+  opts = parser.parse_args(args)
+  if opts.repeat < 1:
+    parser.error('--repeat must be at least 1')
+
+  cases = [] if opts.no_packs else [
+      pack_case('base'),
+      pack_case('bobs'),
+      pack_case('bobs', exact=True)
+  ]
+  cases += [
+      synthetic(n, opts.fan_in, opts.depth, opts.shared, opts.side_outputs,
+                opts.cycles, opts.seed) for n in opts.items
+  ]
+  results = benchmark(cases, opts.repeat)
+  baseline = {}
+  if opts.compare:
+    with open(opts.compare, encoding='utf-8') as f:
+      baseline = json.load(f)
+  print_results(results, baseline, stdout)
+  if opts.save:
+    with open(opts.save, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+  main(argv[1:])
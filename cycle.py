@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+
+import os
+from sys import argv
+
+from pack import PACKS, run_pack
+
+
+def main(args):
+  # The pack has a cycle, which only the matrix solver takes.
+  run_pack(os.path.join(PACKS, 'cycle.toml'), ['--solver', 'matrix'] + args)
+
+
+if __name__ == "__main__":
+  main(argv[1:])
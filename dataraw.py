@@ -0,0 +1,229 @@
+import json
+import re
+from collections import defaultdict
+from typing import Iterator, TextIO
+
+# Prototype types the importer reads; everything else is skipped entry by
+# entry, so memory is bounded by the largest single prototype.
+CRAFTING_MACHINES = ('assembling-machine', 'furnace', 'rocket-silo')
+TYPES = frozenset(CRAFTING_MACHINES + ('recipe', 'module', 'resource',
+                                      'offshore-pump', 'fluid'))
+CHUNK = 1 << 20
+
+ENERGY = re.compile(r'([0-9.]+)\s*([kMGT]?)W')
+SCALE = {'': 1e-6, 'k': 1e-3, 'M': 1., 'G': 1e3, 'T': 1e6}
+
+
+class Reader:
+  # Incremental JSON over a text stream: values are decoded one at a time and
+  # the buffer only holds the one being read.
+
+  def __init__(self, file: TextIO):
+    self.file = file
+    self.buf = ''
+    self.pos = 0
+    self.eof = False
+    self.decoder = json.JSONDecoder()
+
+  def fill(self):
+    chunk = self.file.read(CHUNK)
+    if not chunk:
+      self.eof = True
+    self.buf = self.buf[self.pos:] + chunk
+    self.pos = 0
+
+  def peek(self) -> str:
+    while True:
+      while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+        self.pos += 1
+      if self.pos < len(self.buf):
+        return self.buf[self.pos]
+      if self.eof:
+        raise ValueError("Unexpected end of data-raw dump")
+      self.fill()
+
+  def expect(self, char: str):
+    if self.peek() != char:
+      raise ValueError(
+          f"Expected {char!r} at {self.buf[self.pos:self.pos + 20]!r}")
+    self.pos += 1
+
+  def value(self):
+    self.peek()
+    while True:
+      try:
+        value, end = self.decoder.raw_decode(self.buf, self.pos)
+        # A number may carry on in the next chunk.
+        if end < len(self.buf) or self.eof:
+          self.pos = end
+          return value
+      except json.JSONDecodeError:
+        if self.eof:
+          raise
+      self.fill()
+
+  def members(self) -> Iterator[str]:
+    # Yields each key of an object; the caller consumes its value.
+    self.expect('{')
+    if self.peek() == '}':
+      self.pos += 1
+      return
+    while True:
+      key = self.value()
+      self.expect(':')
+      yield key
+      if self.peek() == ',':
+        self.pos += 1
+        continue
+      self.expect('}')
+      return
+
+
+def prototypes(file: TextIO, types=TYPES) -> Iterator[tuple[str, str, dict]]:
+  reader = Reader(file)
+  for type in reader.members():
+    for name in reader.members():
+      prototype = reader.value()
+      if type in types:
+        yield type, name, prototype
+
+
+def energy_mw(energy: str) -> float:
+  match = ENERGY.fullmatch(energy.strip())
+  if not match:
+    raise ValueError(f"Can't parse energy {energy!r}")
+  return float(match.group(1)) * SCALE[match.group(2)]
+
+
+def listed(value) -> list:
+  # Lua serialises an empty table as {} rather than [].
+  return list(value.values()) if isinstance(value, dict) else value or []
+
+
+def amounts(entries) -> dict[str, float]:
+  # Ingredients and results come as [name, amount] or as tables, and results
+  # may be random: use the expected amount.
+  total: dict[str, float] = defaultdict(float)
+  for entry in listed(entries):
+    if isinstance(entry, list):
+      name, amount = entry
+    else:
+      name = entry['name']
+      if 'amount' in entry:
+        amount = entry['amount']
+      else:
+        amount = (entry['amount_min'] + entry['amount_max']) / 2
+      amount *= entry.get('probability', 1)
+    total[name] += amount
+  return total
+
+
+def recipe_variant(name: str, prototype: dict, difficulty: str) -> dict:
+  # Either difficulty may be false when the recipe is only enabled in one.
+  # The name comes from the table key, as entries needn't repeat it.
+  other = 'expensive' if difficulty == 'normal' else 'normal'
+  variant = prototype.get(difficulty) or prototype.get(other)
+  if not variant:
+    return {**prototype, 'name': name}
+  return {**variant, 'name': name,
+          'category': prototype.get('category', 'crafting')}
+
+
+def results(recipe: dict) -> dict[str, float]:
+  if 'results' in recipe:
+    return amounts(recipe['results'])
+  return {recipe['result']: recipe.get('result_count', 1)}
+
+
+def import_data_raw(path: str,
+                    difficulty: str = 'normal',
+                    category_buildings: dict[str, str] = {}) -> dict:
+  # Returns the pack fields (see pack.parse_pack) for a --dump-data dump.
+  machines: dict[str, dict] = {}
+  categories: dict[str, list[str]] = defaultdict(list)
+  modules: dict[str, dict] = {}
+  mined: set[str] = set()
+  fluids: set[str] = set()
+  recipes: list[dict] = []
+  with open(path, encoding='utf-8') as f:
+    for type, name, p in prototypes(f):
+      if type in CRAFTING_MACHINES:
+        source = p.get('energy_source', {})
+        machines[name] = {
+            'crafting_speed': p.get('crafting_speed', 1),
+            'productivity': 1 + p.get('base_productivity', 0),
+            'slots': p.get('module_specification', {}).get('module_slots', 0),
+            'power': (energy_mw(p['energy_usage'])
+                      if source.get('type') == 'electric' else 0),
+        }
+        for category in listed(p.get('crafting_categories')):
+          categories[category].append(name)
+      elif type == 'module':
+        effect = p.get('effect', {})
+        modules[name] = {
+            'crafting_speed': effect.get('speed', {}).get('bonus', 0),
+            'productivity': effect.get('productivity', {}).get('bonus', 0),
+            'power': effect.get('consumption', {}).get('bonus', 0),
+        }
+      elif type == 'resource':
+        minable = p.get('minable', {})
+        mined.update(results(minable) if minable else ())
+      elif type == 'offshore-pump':
+        mined.add(p.get('fluid', 'water'))
+      elif type == 'fluid':
+        fluids.add(name)
+      elif not p.get('hidden'):
+        recipes.append(recipe_variant(name, p, difficulty))
+
+  # Without a preference, each category is made in its fastest machine.
+  building = {
+      category: max(names, key=lambda n: machines[n]['crafting_speed'])
+      for category, names in categories.items()
+  }
+  building.update(category_buildings)
+
+  by_product: dict[str, list[dict]] = defaultdict(list)
+  for r in recipes:
+    if r.get('category', 'crafting') not in building:
+      continue
+    made = results(r)
+    used = amounts(r.get('ingredients'))
+    # Catalysts such as kovarex's uranium-235 only count by their net amount.
+    for name in made.keys() & used.keys():
+      net = made.pop(name) - used.pop(name)
+      if net > 0:
+        made[name] = net
+      elif net < 0:
+        used[name] = -net
+    main = r.get('main_product') or (r['name'] if r['name'] in made else
+                                     next(iter(made), None))
+    if not made.get(main):
+      continue
+    by_product[main].append({
+        'name': r['name'],
+        'building': building[r.get('category', 'crafting')],
+        'output_qty': made.pop(main),
+        'time': r.get('energy_required', 0.5),
+        'ingredients': dict(used),
+        'side_outputs': dict(made),
+    })
+
+  # Recipes are keyed by what they make, so alternates take the
+  # 'item (variant)' names the LP solver groups by.
+  packed = []
+  for product, options in by_product.items():
+    options.sort(key=lambda r: r['name'] != product)
+    for i, r in enumerate(options):
+      name = r['name']
+      r['name'] = (product if i == 0 and product not in mined else
+                   f"{product} ({name})")
+      packed.append(r)
+  made = {r['name'] for r in packed}
+  consumed = {i for r in packed for i in r['ingredients']}
+  return {
+      'modules': modules,
+      'buildings': machines,
+      'raws': sorted(mined | (consumed - made)),
+      'fluids': sorted(fluids),
+      'recipes': packed,
+  }
@@ -0,0 +1,85 @@
+from typing import NamedTuple, TextIO
+
+from fcalc import Demand, RecipeGraph, Subfactories, Totals
+
+EPSILON = 1e-9
+
+
+class Plan(NamedTuple):
+  totals: dict[str, Totals]
+  buildings: dict[str, str]  # What makes each crafted item.
+  raws: frozenset[str]
+
+  def made_by(self, name: str) -> str:
+    if name in self.raws:
+      return 'raw'
+    return self.buildings.get(name, 'not made')
+
+
+def plan(graph: RecipeGraph, totals: dict[str, Totals]) -> Plan:
+  return Plan(
+      totals, {
+          name: r.building.name
+          for name, r in graph.recipes.items()
+          if name not in graph.raws
+      }, frozenset(graph.raws))
+
+
+def diff_plans(
+    graph: RecipeGraph, demands: list[Demand], other: RecipeGraph,
+    other_demands: list[Demand]
+) -> tuple[Plan, Plan]:
+  # Plans before and after moving from one configuration to the other. Both
+  # are solved, but when they make the same items the other borrows the
+  # first's unit expansions that touch none of the recipes that differ, and
+  # its order when no recipe's inputs changed, so only what changed is
+  # expanded again. graph is left as it was.
+  before = plan(graph, Subfactories(graph, demands).totals())
+  other.refresh()
+  if graph.names == other.names:
+    changed = set()
+    same_inputs = True
+    for item, (a, b) in enumerate(
+        zip(graph.compiled[:graph.recipe_count],
+            other.compiled[:other.recipe_count])):
+      if a.recipe != b.recipe:
+        changed.add(item)
+        same_inputs = same_inputs and a.inputs == b.inputs
+    if same_inputs:
+      other.__dict__.setdefault('order', graph.order)
+      other.__dict__.setdefault('rank', graph.rank)
+    for key, unit in graph.units.items():
+      if changed.isdisjoint(unit.ids):
+        other.units.setdefault(key, unit)
+  return before, plan(other, Subfactories(other, other_demands).totals())
+
+
+def print_diff(before: Plan, after: Plan, output: TextIO):
+  rows = []
+  for name in before.totals.keys() | after.totals.keys():
+    b, a = before.totals.get(name, Totals()), after.totals.get(name, Totals())
+    delta = tuple(
+        float(getattr(a, field)) - float(getattr(b, field))
+        for field in ('buildings', 'power', 'items_per_sec'))
+    if any(abs(d) > EPSILON for d in delta):
+      rows.append((delta, name))
+  output.write("     Δ🏭       ΔMW     Δ/sec item (building)\n")
+  for (buildings, power, items_per_sec), name in sorted(
+      rows, key=lambda r: (-abs(r[0][0]), -abs(r[0][2]), r[1])):
+    was, now = before.made_by(name), after.made_by(name)
+    output.write(f"{buildings: 8.1f} {power: 9.2f} {items_per_sec: 9.2f} "
+                 f"{name} ({was if was == now else f'{was} → {now}'})\n")
+
+  def sums(solved: Plan) -> tuple:
+    totals = solved.totals
+    return (float(sum(t.buildings for t in totals.values())),
+            float(sum(t.power for t in totals.values())),
+            float(
+                sum(t.items_per_sec
+                    for name, t in totals.items()
+                    if name in solved.raws)))
+
+  output.write("\n## Totals\n")
+  for unit, was, now in zip(('🏭', 'MW', 'raw/sec'), sums(before),
+                            sums(after)):
+    output.write(f"{was: 10.2f} → {now: 10.2f} {now - was:+10.2f} {unit}\n")
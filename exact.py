@@ -0,0 +1,53 @@
+from dataclasses import replace
+from fractions import Fraction
+
+from fcalc import (Building, Demand, Ingredient, ModdedBuilding, Module,
+                   RecipeGraph)
+
+
+def rational(x):
+  # Pack numbers are decimals, and a float's repr is the shortest decimal that
+  # reads back as it, so 0.2 becomes 1/5 rather than the nearest binary.
+  return Fraction(repr(x)) if isinstance(x, float) else Fraction(x)
+
+
+def exact_module(m: Module) -> Module:
+  return m._replace(crafting_speed=rational(m.crafting_speed),
+                    productivity=rational(m.productivity),
+                    power=rational(m.power))
+
+
+def exact_building(b: Building) -> Building:
+  # Modded buildings are rebuilt from exact modules instead of converting
+  # their float products.
+  if isinstance(b, ModdedBuilding):
+    return ModdedBuilding(b.name, exact_building(b.building),
+                          [exact_module(m) for m in b.modules],
+                          [exact_module(m) for m in b.beacon_modules])
+  return replace(b,
+                 crafting_speed=rational(b.crafting_speed),
+                 productivity=rational(b.productivity),
+                 power=rational(b.power))
+
+
+def exact_graph(graph: RecipeGraph,
+                demands: list[Demand]) -> tuple[RecipeGraph, list[Demand]]:
+  # The same recipes and demands in Fractions, for audit runs. Recipe times
+  # are timedeltas, which are already exact to the microsecond.
+  buildings: dict[int, Building] = {}
+  recipes = {}
+  for name, r in graph.recipes.items():
+    if id(r.building) not in buildings:
+      buildings[id(r.building)] = exact_building(r.building)
+    recipes[name] = r._replace(
+        building=buildings[id(r.building)],
+        output_qty=rational(r.output_qty),
+        ingredients=[
+            Ingredient(i.name, rational(i.qty)) for i in r.ingredients
+        ],
+        side_outputs=[
+            Ingredient(o.name, rational(o.qty)) for o in r.side_outputs
+        ])
+  return (RecipeGraph(recipes, graph.raws, exact=True),
+          [d._replace(min_items_per_second=rational(d.min_items_per_second))
+           for d in demands])
@@ -0,0 +1,1138 @@
+import argparse
+import math
+from array import array
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import timedelta
+from fractions import Fraction
+from functools import cached_property
+from heapq import heapify, heappop, heappush
+from sys import stdout
+from time import perf_counter
+from typing import Callable, NamedTuple, Optional, TextIO
+
+secs = lambda s: timedelta(seconds=s)
+MICROSECOND = timedelta(microseconds=1)
+
+# Set by --profile to an instrument.Profile; hot paths only look at it once
+# per call, so it costs nothing when unset.
+PROFILE = None
+
+
+# A beacon holds BEACON_SLOTS modules and draws BEACON_POWER MW. In rows of
+# machines each beacon reaches BEACON_SHARING of them, so a machine pays for
+# that share of the beacons around it.
+BEACON_SLOTS = 2
+BEACON_POWER = Fraction(12, 25)
+BEACON_SHARING = 2
+
+
+def phase(name: str):
+  return PROFILE.phase(name) if PROFILE else nullcontext()
+
+
+@dataclass
+class Building:
+  name: str
+  crafting_speed: float
+  productivity: float = 1.
+  slots: int = 0
+  power: float = 0  # Electric draw in MW, with that of its beacons.
+  beacons: float = 0  # Beacon buildings that go with each one.
+  power_multiplier = 1.
+
+
+class Module(NamedTuple):
+  name: str
+  crafting_speed: float = 0
+  productivity: float = 0
+  power: float = 0
+
+
+class ModdedBuilding(Building):
+
+  def __init__(self,
+               name: str,
+               building: Building,
+               modules: list[Module],
+               beacon_modules: list[Module] = []):
+    assert (len(modules) <=
+            building.slots), f"{building.name} only has {building.slots} slots!"
+    self.building = building
+    self.modules = modules
+    self.beacon_modules = beacon_modules
+    self.name = name
+    self.productivity = 1
+    self.productivity += sum(m.productivity for m in modules)
+    self.productivity += sum(m.productivity / 2 for m in beacon_modules)
+    crafting_multiplier = 1
+    crafting_multiplier += sum(m.crafting_speed for m in modules)
+    crafting_multiplier += sum(m.crafting_speed / 2 for m in beacon_modules)
+    self.crafting_speed = building.crafting_speed * crafting_multiplier
+    # Consumption can't be reduced below 20%; a Fraction keeps exact modules
+    # exact.
+    self.power_multiplier = max(
+        Fraction(1, 5), 1 + sum(m.power for m in modules) +
+        sum(m.power / 2 for m in beacon_modules))
+    self.beacons = Fraction(len(beacon_modules),
+                            BEACON_SLOTS * BEACON_SHARING)
+    self.power = (building.power * self.power_multiplier +
+                  self.beacons * BEACON_POWER)
+
+
+class Ingredient(NamedTuple):
+  name: str
+  qty: float = 1
+
+
+class Recipe(NamedTuple):
+  name: str
+  building: Building
+  output_qty: float
+  time: timedelta
+  ingredients: list[Ingredient]
+  side_outputs: list[Ingredient] = []
+
+
+class Demand(NamedTuple):
+  name: str
+  min_items_per_second: float = 0
+
+
+@dataclass
+class Totals:
+  buildings: float = 0
+  items_per_sec: float = 0
+  refcount: int = 0
+  power: float = 0  # MW.
+
+
+class Logistics(NamedTuple):
+  # Fluids go by pipe and everything else by belt. Flows are shown in lanes
+  # or pipes, and a subfactory is built as parallel copies when one of its
+  # edges would need more than a belt or a pipe.
+  lane: float = 7.5  # Items/sec on one lane of the belt in use.
+  pipe: float = 1200
+  fluids: frozenset[str] = frozenset()
+  belts: dict[str, float] = {}  # Items/sec on a whole belt of each tier.
+
+  def tier(self, belt: str) -> 'Logistics':
+    return self._replace(lane=self.belts[belt] / 2)
+
+  def carriers(self, name: str, items_per_sec: float) -> float:
+    return items_per_sec / (self.pipe if name in self.fluids else self.lane)
+
+  def annotate(self, name: str, items_per_sec: float) -> str:
+    carriers = self.carriers(name, items_per_sec)
+    if carriers <= 1:
+      return ''
+    return ' %5.1f%s' % (carriers, '║' if name in self.fluids else '┋')
+
+  def copies(self, names: list[str], unit: 'Unit',
+             items_per_second: float) -> int:
+    # A belt is two lanes. Each copy keeps at least one whole building of
+    # the item itself, so an edge that still needs more than a belt is left
+    # to show its lanes or pipes.
+    worst = max(
+        (edge * items_per_second / (self.pipe if names[item] in self.fluids
+                                    else 2 * self.lane)
+         for item, edge in zip(unit.ids, unit.edges)),
+        default=0)
+    buildings = unit.buildings[0] * items_per_second if unit.ids else 0
+    return max(1, min(math.ceil(worst - 1e-9),
+                      math.floor(buildings + 1e-9)))
+
+
+def check_recipes(recipes: dict[str, Recipe], raws: set[str]):
+  result = True
+  for r in recipes.values():
+    for i in r.ingredients:
+      if i.name in recipes or i.name in raws:
+        continue
+      print(f"Recipe {r.name} references non-existent ingredient {i.name}")
+      result = False
+  return result
+
+
+def per_building_per_sec(recipe: Recipe, exact: bool = False) -> float:
+  if exact:
+    seconds = Fraction(recipe.time // MICROSECOND, 1_000_000)
+  else:
+    seconds = recipe.time.total_seconds()
+  return (recipe.output_qty / seconds * recipe.building.crafting_speed *
+          recipe.building.productivity)
+
+
+def numbers(exact: bool, values=()):
+  # Exact graphs keep their Fractions in lists rather than float arrays.
+  return list(values) if exact else array('d', values)
+
+
+class CompiledRecipe:
+  # Rates are per item/sec of the recipe's main output.
+  __slots__ = ('recipe', 'building', 'per_building_per_sec', 'power',
+               'inputs', 'coefficients', 'side_outputs', 'side_coefficients')
+
+  def __init__(self,
+               recipe: Recipe,
+               ids: dict[str, int],
+               exact: bool = False):
+    self.recipe = recipe
+    # The building can be edited in place, so remember what was compiled.
+    self.building = (recipe.building.crafting_speed,
+                     recipe.building.productivity, recipe.building.power)
+    self.per_building_per_sec = per_building_per_sec(recipe, exact)
+    self.power = recipe.building.power / self.per_building_per_sec
+    self.inputs = array('l', (ids[i.name] for i in recipe.ingredients))
+    self.coefficients = numbers(
+        exact, (i.qty / recipe.output_qty / recipe.building.productivity
+                for i in recipe.ingredients))
+    self.side_outputs = array('l', (ids[o.name] for o in recipe.side_outputs))
+    self.side_coefficients = numbers(
+        exact, (o.qty / recipe.output_qty for o in recipe.side_outputs))
+
+  # Packs are cached as pickles; raw bytes are much cheaper than arrays.
+  def __getstate__(self):
+    packed = lambda a: a.tobytes() if isinstance(a, array) else a
+    return (self.recipe, self.building, self.per_building_per_sec, self.power,
+            self.inputs.tobytes(), packed(self.coefficients),
+            self.side_outputs.tobytes(), packed(self.side_coefficients))
+
+  def __setstate__(self, state):
+    (self.recipe, self.building, self.per_building_per_sec, self.power, inputs,
+     coefficients, side_outputs, side_coefficients) = state
+    unpacked = lambda a: array('d', a) if isinstance(a, bytes) else a
+    self.inputs = array('l', inputs)
+    self.coefficients = unpacked(coefficients)
+    self.side_outputs = array('l', side_outputs)
+    self.side_coefficients = unpacked(side_coefficients)
+
+
+def topological_order(compiled: list[Optional[CompiledRecipe]]) -> array:
+  # Products come before their ingredients; raws are leaves even if they also
+  # have a recipe.
+  order = array('l')
+  state: dict[int, bool] = {}  # False while on the stack, True when done.
+  for root in range(len(compiled)):
+    if root in state:
+      continue
+    state[root] = False
+    stack = [(root, 0)]
+    while stack:
+      item, i = stack.pop()
+      recipe = compiled[item]
+      if recipe is not None and i < len(recipe.inputs):
+        stack.append((item, i + 1))
+        child = recipe.inputs[i]
+        if child not in state:
+          state[child] = False
+          stack.append((child, 0))
+        elif not state[child]:
+          raise ValueError(
+              f"Recipe cycle through {recipe.recipe.ingredients[i].name}"
+              f" (from {recipe.recipe.name})")
+        continue
+      state[item] = True
+      order.append(item)
+  order.reverse()
+  return order
+
+
+class Unit:
+  # What one item/sec of an item expands to, down to raws and the deferred
+  # items: the items touched, with items/sec, buildings, MW, path counts and
+  # the most any one edge into the item carries.
+  __slots__ = ('ids', 'items', 'buildings', 'power', 'paths', 'edges')
+
+  def __init__(self, exact: bool = False):
+    self.ids = array('l')
+    self.items = numbers(exact)
+    self.buildings = numbers(exact)
+    self.power = numbers(exact)
+    self.paths = array('q')
+    self.edges = numbers(exact)
+
+
+class RecipeGraph:
+  # An exact graph's recipes hold Fractions (see exact.py), and it computes
+  # in Fractions rather than floats.
+
+  def __init__(self,
+               recipes: dict[str, Recipe],
+               raws: set[str],
+               exact: bool = False):
+    self.recipes = recipes
+    self.raws = raws
+    self.exact = exact
+    self.compile()
+
+  def compile(self):
+    recipes, raws = self.recipes, self.raws
+    self.raw_names = frozenset(raws)
+    # Item ids: the crafted items come first, so they double as recipe ids.
+    self.names = [name for name in recipes if name not in raws]
+    self.recipe_count = len(self.names)
+    self.ids = {name: i for i, name in enumerate(self.names)}
+    for r in recipes.values():
+      for i in r.ingredients + r.side_outputs:
+        self.intern(i.name)
+    for name in sorted(raws):
+      self.intern(name)
+    self.compiled: list[Optional[CompiledRecipe]] = [
+        CompiledRecipe(recipes[name], self.ids, self.exact)
+        for name in self.names[:self.recipe_count]
+    ] + [None] * (len(self.names) - self.recipe_count)
+    self.units: dict[tuple[int, frozenset[int]], Unit] = {}
+    self.__dict__.pop('order', None)
+    self.__dict__.pop('rank', None)
+
+  def intern(self, name: str) -> int:
+    if name not in self.ids:
+      self.ids[name] = len(self.names)
+      self.names.append(name)
+    return self.ids[name]
+
+  # Only the tree solver needs an order; the matrix solver accepts cycles.
+  @cached_property
+  def order(self) -> array:
+    return topological_order(self.compiled)
+
+  @cached_property
+  def rank(self) -> array:
+    rank = array('l', [0]) * len(self.order)
+    for i, item in enumerate(self.order):
+      rank[item] = i
+    return rank
+
+  def refresh(self):
+    # Pick up edits to the recipes and buildings since they were compiled.
+    # Recipes whose inputs changed need a new order, so recompile everything;
+    # otherwise recompile the changed recipes and drop only the cached units
+    # that include them.
+    if (self.raw_names != self.raws or
+        len(self.recipes) != len(self.raw_names.intersection(self.recipes)) +
+        self.recipe_count or
+        any(name not in self.recipes
+            for name in self.names[:self.recipe_count])):
+      return self.compile()
+    changed = set()
+    for item, compiled in enumerate(self.compiled[:self.recipe_count]):
+      recipe = self.recipes[self.names[item]]
+      if recipe is not compiled.recipe:
+        if ([i.name for i in recipe.ingredients + recipe.side_outputs] != [
+            self.names[i]
+            for i in compiled.inputs.tolist() + compiled.side_outputs.tolist()
+        ]):
+          return self.compile()
+        changed.add(item)
+      elif compiled.building != (recipe.building.crafting_speed,
+                                 recipe.building.productivity,
+                                 recipe.building.power):
+        changed.add(item)
+    for item in changed:
+      self.compiled[item] = CompiledRecipe(self.recipes[self.names[item]],
+                                           self.ids, self.exact)
+    if changed:
+      self.units = {
+          key: unit
+          for key, unit in self.units.items()
+          if changed.isdisjoint(unit.ids)
+      }
+
+  def unit(self, name: str, deferred: set[str]) -> Unit:
+    root = self.ids[name]
+    stop = frozenset(self.ids[n] for n in deferred if n != name)
+    unit = self.units.get((root, stop))
+    if unit is None:
+      unit = self.units[(root, stop)] = self.expand(root, stop)
+    return unit
+
+  def expand(self, root: int, stop: frozenset[int]) -> Unit:
+    # Push one item/sec down the DAG in topological order, so every item is
+    # expanded once with its full rate instead of once per path.
+    start = perf_counter() if PROFILE else 0
+    if self.exact:
+      rates = [0] * len(self.names)
+      edges = [0] * len(self.names)
+    else:
+      rates = array('d', bytes(8 * len(self.names)))
+      edges = array('d', bytes(8 * len(self.names)))
+    paths = array('q', bytes(8 * len(self.names)))
+    rates[root] = 1
+    paths[root] = 1
+    edges[root] = 1  # Its output.
+    unit = Unit(self.exact)
+    for item in self.order[self.rank[root]:]:
+      count = paths[item]
+      if not count:
+        continue
+      items_per_sec = rates[item]
+      recipe = self.compiled[item]
+      unit.ids.append(item)
+      unit.items.append(items_per_sec)
+      unit.paths.append(count)
+      unit.edges.append(edges[item])
+      if recipe is None or item in stop:
+        unit.buildings.append(0)
+        unit.power.append(0)
+        continue
+      unit.buildings.append(items_per_sec / recipe.per_building_per_sec)
+      unit.power.append(items_per_sec * recipe.power)
+      for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+        flow = coefficient * items_per_sec
+        rates[input] += flow
+        paths[input] += count
+        if flow > edges[input]:
+          edges[input] = flow
+    if PROFILE:
+      PROFILE.expanded(self, root, unit, perf_counter() - start)
+    return unit
+
+
+def evaluate(graph: RecipeGraph, name: str, items_per_second: float,
+             totals: dict[str, Totals], deferred: set[str]):
+  # Expansions are linear in the rate, so scale the cached unit expansion.
+  unit = graph.unit(name, deferred)
+  names = graph.names
+  for item, items_per_sec, buildings, power, paths in zip(
+      unit.ids, unit.items, unit.buildings, unit.power, unit.paths):
+    total = totals.setdefault(names[item], Totals())
+    total.items_per_sec += items_per_sec * items_per_second
+    total.buildings += buildings * items_per_second
+    total.power += power * items_per_second
+    total.refcount += paths
+
+
+class Subfactories:
+  # Each Demand is a subfactory that stops expanding at the other demands.
+  # Subfactories are processed in topological order and only reprocessed when
+  # the rate requested of them changes, until the rates settle. Exact graphs
+  # settle exactly.
+  TOLERANCE = 1e-9
+
+  def __init__(self, graph: RecipeGraph, demands: list[Demand]):
+    graph.refresh()
+    self.graph = graph
+    self.deferred = set(d.name for d in demands)
+    self.floors = {d.name: d.min_items_per_second for d in demands}
+    self.requested: dict[str, float] = {}
+    # What each subfactory adds to every item, itself included.
+    self.contributions: dict[str, dict[str, Totals]] = {}
+    # Load placed on each subfactory by the other subfactories.
+    self.inflow = {name: Totals() for name in self.deferred}
+    self.dirty = set(self.deferred)
+    self.settle()
+
+  def settle(self):
+    rank = self.graph.rank
+    ids = self.graph.ids
+    tolerance = 0 if self.graph.exact else self.TOLERANCE
+    queue = [(rank[ids[name]], name) for name in self.dirty]
+    heapify(queue)
+    self.dirty.clear()
+    queued = set(name for _, name in queue)
+    while queue:
+      _, name = heappop(queue)
+      queued.remove(name)
+      requested = max(self.inflow[name].items_per_sec, self.floors[name])
+      if (name in self.requested and abs(requested - self.requested[name]) <=
+          tolerance * max(1, requested)):
+        continue
+      self.requested[name] = requested
+      old = self.contributions.get(name, {})
+      new: dict[str, Totals] = {}
+      evaluate(self.graph, name, requested, new, self.deferred)
+      self.contributions[name] = new
+      self.contributed(name, old, new)
+      for item in self.deferred.intersection(old.keys() | new.keys()):
+        if item == name:
+          continue
+        before, after = old.get(item, Totals()), new.get(item, Totals())
+        self.inflow[item].items_per_sec += (after.items_per_sec -
+                                            before.items_per_sec)
+        self.inflow[item].refcount += after.refcount - before.refcount
+        if item not in queued:
+          queued.add(item)
+          heappush(queue, (rank[ids[item]], item))
+
+  def contributed(self, name: str, old: dict[str, Totals],
+                  new: dict[str, Totals]):
+    pass
+
+  def totals(self) -> dict[str, Totals]:
+    totals: dict[str, Totals] = {}
+    for name, contribution in self.contributions.items():
+      for item, t in contribution.items():
+        # Load on other subfactories is already part of their own request.
+        if item != name and item in self.deferred:
+          continue
+        total = totals.setdefault(item, Totals())
+        total.buildings += t.buildings
+        total.items_per_sec += t.items_per_sec
+        total.refcount += t.refcount
+        total.power += t.power
+    return totals
+
+
+class Factory(Subfactories):
+  # A solution that is edited in place: each edit reprocesses only the
+  # subfactories that expand the changed item, and their change in
+  # contribution is applied to the running totals.
+
+  def __init__(self, graph: RecipeGraph, demands: list[Demand]):
+    self.current: dict[str, Totals] = {}
+    super().__init__(graph, demands)
+
+  def contributed(self, name: str, old: dict[str, Totals],
+                  new: dict[str, Totals]):
+    for item in old.keys() | new.keys():
+      # Load on other subfactories is already part of their own request.
+      if item != name and item in self.deferred:
+        continue
+      before, after = old.get(item, Totals()), new.get(item, Totals())
+      self.add(item, after, 1)
+      self.add(item, before, -1)
+
+  def add(self, item: str, t: Totals, sign: int):
+    total = self.current.setdefault(item, Totals())
+    total.buildings += sign * t.buildings
+    total.items_per_sec += sign * t.items_per_sec
+    total.refcount += sign * t.refcount
+    total.power += sign * t.power
+    if not total.refcount:
+      del self.current[item]
+
+  def totals(self) -> dict[str, Totals]:
+    return self.current
+
+  def set_demand(self, name: str, min_items_per_second: float):
+    if name not in self.deferred:
+      # Subfactories that expanded the item now stop there and request it
+      # from its own subfactory instead.
+      inflow = Totals()
+      for other, contribution in self.contributions.items():
+        if name in contribution:
+          inflow.items_per_sec += contribution[name].items_per_sec
+          inflow.refcount += contribution[name].refcount
+          self.add(name, contribution[name], -1)
+          self.requested.pop(other)
+          self.dirty.add(other)
+      self.deferred.add(name)
+      self.inflow[name] = inflow
+    self.floors[name] = min_items_per_second
+    self.dirty.add(name)
+    self.settle()
+
+  def set_recipe_building(self, name: str, building: Building):
+    recipes = self.graph.recipes
+    recipes[name] = recipes[name]._replace(building=building)
+    self.recalculate(name)
+
+  def add_recipe(self, recipe: Recipe):
+    # Also replaces the recipe for an existing item.
+    self.add_recipes([recipe])
+
+  def add_recipes(self, recipes: list[Recipe]):
+    # Settles once for all of them.
+    for recipe in recipes:
+      self.graph.recipes[recipe.name] = recipe
+    self.recalculate(*(recipe.name for recipe in recipes))
+
+  def recalculate(self, *names: str):
+    self.graph.refresh()
+    for other, contribution in self.contributions.items():
+      if any(name in contribution and
+             (other == name or name not in self.deferred) for name in names):
+        self.requested.pop(other)
+        self.dirty.add(other)
+    self.settle()
+
+
+class Sweep(NamedTuple):
+  names: list[str]
+  # Scenarios x items.
+  items_per_sec: 'numpy.ndarray'
+  buildings: 'numpy.ndarray'
+  power: 'numpy.ndarray'
+
+  def totals(self, scenario: int) -> dict[str, Totals]:
+    return {
+        name: Totals(buildings=float(b), items_per_sec=float(i), power=float(p))
+        for name, i, b, p in zip(self.names, self.items_per_sec[scenario],
+                                 self.buildings[scenario], self.power[scenario])
+    }
+
+
+def sweep(graph: RecipeGraph, demands: list[Demand], rates) -> Sweep:
+  # rates holds one row of min_items_per_second per scenario, with a column
+  # for each demand. Subfactories are settled for every scenario at once,
+  # using the cached unit expansions.
+  import numpy as np
+
+  graph.refresh()
+  rates = np.asarray(rates, dtype=float)
+  assert (rates.ndim == 2 and rates.shape[1] == len(demands)
+         ), f"Expected a scenarios x {len(demands)} array of rates"
+  deferred = set(d.name for d in demands)
+  position = {graph.ids[d.name]: k for k, d in enumerate(demands)}
+  units = [graph.unit(d.name, deferred) for d in demands]
+  columns: dict[int, int] = {}
+  for unit in units:
+    for item in unit.ids:
+      columns.setdefault(item, len(columns))
+
+  # coupling[k, j] is the load one item/sec of subfactory k places on j.
+  coupling = np.zeros((len(demands), len(demands)))
+  items = np.zeros((len(demands), len(columns)))
+  buildings = np.zeros((len(demands), len(columns)))
+  power = np.zeros((len(demands), len(columns)))
+  for k, (demand, unit) in enumerate(zip(demands, units)):
+    root = graph.ids[demand.name]
+    for item, items_per_sec, b, p in zip(unit.ids, unit.items, unit.buildings,
+                                         unit.power):
+      if item != root and item in position:
+        coupling[k, position[item]] += items_per_sec
+      else:
+        items[k, columns[item]] += items_per_sec
+      buildings[k, columns[item]] += b
+      power[k, columns[item]] += p
+
+  requested = np.zeros_like(rates)
+  for k in sorted(range(len(demands)),
+                  key=lambda k: graph.rank[graph.ids[demands[k].name]]):
+    requested[:, k] = np.maximum(rates[:, k], requested @ coupling[:, k])
+  return Sweep([graph.names[item] for item in columns], requested @ items,
+               requested @ buildings, requested @ power)
+
+
+def tree_expander(graph: RecipeGraph, stop: set[int],
+                  max_depth: Optional[int]) -> Callable[[int, int], bool]:
+  # Whether the tree shows an item's inputs at a depth: not for raws, other
+  # subfactories or below the depth limit.
+
+  def expands(item: int, depth: int) -> bool:
+    recipe = graph.compiled[item]
+    return (recipe is not None and bool(recipe.inputs) and
+            (item not in stop or depth == 0) and depth != max_depth)
+
+  return expands
+
+
+def find_repeats(graph: RecipeGraph, root: int,
+                 expands: Callable[[int, int], bool]) -> set[int]:
+  # Items whose subtree the tree would show more than once.
+  seen: set[int] = set()
+  repeated: set[int] = set()
+
+  def visit(item: int, depth: int):
+    if not expands(item, depth):
+      return
+    if item in seen:
+      repeated.add(item)
+      return
+    seen.add(item)
+    for input in graph.compiled[item].inputs:
+      visit(input, depth + 1)
+
+  visit(root, 0)
+  return repeated
+
+
+def print_tree(graph: RecipeGraph,
+               name: str,
+               items_per_second: float,
+               references: int,
+               deferred: set[str],
+               output: TextIO,
+               logistics: Logistics,
+               max_depth: Optional[int] = None,
+               expand_all: bool = False,
+               copies: int = 1):
+  # A subtree met again is printed once and then referred back to as ※#N, so
+  # the report grows with the unique items rather than the paths. Rates are
+  # for one of the copies of the subfactory.
+
+  def visit(item: int, items_per_sec: float, depth: int):
+    recipe = graph.compiled[item]
+    if recipe is None or (item in stop and depth != 0):
+      lines.append(
+          "%s% 5.2f/s%s %s\n" %
+          ('  ' * depth, items_per_sec,
+           logistics.annotate(names[item], items_per_sec), names[item]))
+      return
+    buildings = items_per_sec / recipe.per_building_per_sec
+    lines.append("%s% 5.2f/s%s % 5.1f🏭 %s (%s)" %
+                 ('  ' * depth, items_per_sec,
+                  logistics.annotate(names[item], items_per_sec), buildings,
+                  names[item], recipe.recipe.building.name))
+    if depth == 0 and copies > 1:
+      lines.append(f" ×{copies}")
+    if depth == 0 and references:
+      lines.append(f" ※{references}")
+    # Only subtrees that are shown can be referred back to.
+    if item in labels and expands(item, depth):
+      lines.append(f" see ※#{labels[item]}\n")
+      return
+    if item in repeated and expands(item, depth):
+      labels[item] = len(labels) + 1
+      lines.append(f" ※#{labels[item]}")
+    if recipe.inputs and depth == max_depth:
+      lines.append(" …")
+    lines.append("\n")
+    if len(lines) > 4096:
+      output.write(''.join(lines))
+      lines.clear()
+    if depth == max_depth:
+      return
+    for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+      visit(input, coefficient * items_per_sec, depth + 1)
+
+  names = graph.names
+  stop = set(graph.ids[n] for n in deferred)
+  root = graph.ids[name]
+  if PROFILE:
+    start = perf_counter()
+    visit = PROFILE.traced(graph, visit)
+  expands = tree_expander(graph, stop, max_depth)
+  repeated = set() if expand_all else find_repeats(graph, root, expands)
+  labels: dict[int, int] = {}
+  lines: list[str] = []
+  visit(root, items_per_second, 0)
+  output.write(''.join(lines))
+  if PROFILE:
+    PROFILE.record(perf_counter() - start, name)
+
+
+def tree_json(graph: RecipeGraph,
+              name: str,
+              items_per_second: float,
+              deferred: set[str],
+              max_depth: Optional[int] = None,
+              expand_all: bool = False) -> dict:
+  # The same tree as print_tree, as nested dicts. A repeated subtree is
+  # given once with an 'id' and then as {'ref': id}; 'truncated' marks
+  # inputs left out below the depth limit.
+
+  def visit(item: int, items_per_sec: float, depth: int) -> dict:
+    recipe = graph.compiled[item]
+    node = {'name': names[item], 'items_per_sec': float(items_per_sec)}
+    if recipe is None or (item in stop and depth != 0):
+      return node
+    node['building'] = recipe.recipe.building.name
+    node['buildings'] = float(items_per_sec / recipe.per_building_per_sec)
+    if not expands(item, depth):
+      if recipe.inputs:
+        node['truncated'] = True
+      return node
+    if item in labels:
+      node['ref'] = labels[item]
+      return node
+    if item in repeated:
+      labels[item] = node['id'] = len(labels) + 1
+    node['inputs'] = [
+        visit(input, coefficient * items_per_sec, depth + 1)
+        for input, coefficient in zip(recipe.inputs, recipe.coefficients)
+    ]
+    return node
+
+  names = graph.names
+  stop = set(graph.ids[n] for n in deferred)
+  root = graph.ids[name]
+  expands = tree_expander(graph, stop, max_depth)
+  repeated = set() if expand_all else find_repeats(graph, root, expands)
+  labels: dict[int, int] = {}
+  return visit(root, items_per_second, 0)
+
+
+def print_totals(graph: RecipeGraph,
+                 totals: dict[str, Totals],
+                 output: TextIO,
+                 logistics: Logistics = Logistics()):
+  recipes = graph.recipes
+  for name, total in sorted(totals.items(),
+                            key=lambda i:
+                            (recipes[i[0]].building.name
+                             if i[0] in recipes else 'xx', i[0])):
+    # Exact totals are Fractions, which only format as floats.
+    buildings, power, items_per_sec = (float(total.buildings),
+                                       float(total.power),
+                                       float(total.items_per_sec))
+    carriers = logistics.carriers(name, items_per_sec)
+    unit = '║' if name in logistics.fluids else '┋'
+    building = recipes[name].building.name if name in recipes else 'raw'
+    output.write(f"{buildings: 6.1f}🏭 {power: 7.2f}MW "
+                 f"{items_per_sec: 7.2f}/sec {carriers: 6.1f}{unit} "
+                 f"{name} ({building})")
+    if total.refcount > 1:
+      output.write(f" ※{total.refcount}")
+    output.write("\n")
+  output.write(f"\n## Buildings\n"
+               f"{float(sum(t.buildings for t in totals.values())): 8.1f}🏭 "
+               f"machines\n")
+  beacons = beacon_count(graph, totals)
+  if beacons:
+    output.write(f"{float(beacons): 8.1f}🏭 beacons\n")
+  output.write(
+      f"\n## Power\n{float(sum(t.power for t in totals.values())): 8.2f}MW\n")
+
+
+def beacon_count(graph: RecipeGraph, totals: dict[str, Totals]) -> float:
+  # The beacons that go with the machines; their power is already part of the
+  # machines'.
+  recipes = graph.recipes
+  return sum(t.buildings * recipes[name].building.beacons
+             for name, t in totals.items()
+             if name in recipes)
+
+
+class RecipeMatrix(NamedTuple):
+  # Sparse (COO) item x recipe matrix of net items/sec per building. Rows are
+  # item ids and columns recipe ids, see RecipeGraph.
+  rows: array
+  cols: array
+  values: array
+
+
+def recipe_matrix(graph: RecipeGraph,
+                  products: Optional[list[int]] = None) -> RecipeMatrix:
+  # products maps a recipe to the row of its main output; by default every
+  # recipe is its own item.
+  m = RecipeMatrix(array('l'), array('l'), array('d'))
+  for j, recipe in enumerate(graph.compiled[:graph.recipe_count]):
+    rate = recipe.per_building_per_sec
+    m.rows.append(products[j] if products else j)
+    m.cols.append(j)
+    m.values.append(rate)
+    for item, coefficient in zip(recipe.side_outputs,
+                                 recipe.side_coefficients):
+      m.rows.append(item)
+      m.cols.append(j)
+      m.values.append(coefficient * rate)
+    for item, coefficient in zip(recipe.inputs, recipe.coefficients):
+      m.rows.append(item)
+      m.cols.append(j)
+      m.values.append(-coefficient * rate)
+  return m
+
+
+def solve_matrix(
+    graph: RecipeGraph,
+    demands: list[Demand]) -> tuple[dict[str, Totals], dict[str, float]]:
+  import numpy as np
+
+  graph.refresh()
+  m = recipe_matrix(graph)
+  n = graph.recipe_count
+  a = np.zeros((len(graph.names), n))
+  np.add.at(a, (np.asarray(m.rows), np.asarray(m.cols)), np.asarray(m.values))
+  produced_by, consumed_by = np.maximum(a, 0), np.maximum(-a, 0)
+  floor = np.zeros(len(graph.names))
+  for d in demands:
+    if graph.ids.get(d.name, n) < n:
+      floor[graph.ids[d.name]] = d.min_items_per_second
+  # Demands are floors on production: an item made at its floor has that row
+  # fixed to what it produces, and any other is balanced, producing what is
+  # consumed. Which floors bind follows from the solution, so the active set
+  # is corrected and solved again until every item makes the larger of the
+  # two.
+  bound = floor > 0
+  active = np.ones(n, dtype=bool)
+  for _ in range(4 * n + 1):
+    x = np.zeros(n)
+    idx = np.flatnonzero(active)
+    rows = np.where(bound[idx, None], produced_by[idx], a[idx])
+    try:
+      x[idx] = np.linalg.solve(rows[:, idx],
+                               np.where(bound[idx], floor[idx], 0))
+    except np.linalg.LinAlgError:
+      raise ValueError("Recipe matrix is singular; does a cycle lack an input?")
+    # By-products already cover more than is consumed, so drop the recipe and
+    # let the item run a surplus.
+    covered = x < -1e-9
+    if covered.any():
+      active &= ~covered
+      continue
+    produced, consumed = produced_by @ x, consumed_by @ x
+    # A floor binds when it is more than is consumed downstream.
+    binds = active & (floor[:n] > consumed[:n] + 1e-9)
+    short = ~active & (produced[:n] <
+                       np.maximum(consumed[:n], floor[:n]) - 1e-9)
+    if (binds == bound[:n]).all() and not short.any():
+      break
+    bound[:n] = binds
+    active |= short
+  else:
+    raise ValueError("Matrix solver did not converge")
+
+  external = np.maximum(floor - consumed_by @ x, 0)
+  used = consumed_by @ x + external
+  totals: dict[str, Totals] = {}
+  surplus: dict[str, float] = {}
+  for i, name in enumerate(graph.names):
+    if i < n or name not in graph.raws:
+      items_per_sec, extra = min(used[i], produced[i]), produced[i] - used[i]
+    else:
+      items_per_sec, extra = used[i] - produced[i], produced[i] - used[i]
+    if i < n and x[i] > 1e-9 or items_per_sec > 1e-9:
+      totals[name] = Totals(
+          buildings=x[i] if i < n else 0,
+          items_per_sec=max(items_per_sec, 0),
+          power=x[i] * graph.compiled[i].recipe.building.power if i < n else 0)
+    if extra > 1e-9:
+      surplus[name] = extra
+  return totals, surplus
+
+
+def print_surplus(surplus: dict[str, float], output: TextIO):
+  for name, items_per_sec in sorted(surplus.items()):
+    output.write(f"{items_per_sec: 7.2f}/sec {name}\n")
+
+
+def calculate(graph: RecipeGraph,
+              demands: list[Demand],
+              output: TextIO,
+              logistics: Logistics,
+              solver: str = 'tree',
+              max_depth: Optional[int] = None,
+              expand_all: bool = False,
+              jobs: Optional[int] = 1):
+  if solver == 'matrix':
+    with phase('compute'):
+      totals, surplus = solve_matrix(graph, demands)
+    with phase('render'):
+      output.write("\n## Totals\n")
+      print_totals(graph, totals, output, logistics)
+      if surplus:
+        output.write("\n## Surplus\n")
+        print_surplus(surplus, output)
+    return
+
+  with phase('compute'):
+    if jobs == 1:
+      subfactories = Subfactories(graph, demands)
+    else:
+      from parallel import solve
+      subfactories = solve(graph, demands, jobs)
+    totals = subfactories.totals()
+  with phase('render'):
+    for demand in demands:
+      output.write("\n")
+      requested = subfactories.requested[demand.name]
+      copies = logistics.copies(graph.names,
+                                graph.unit(demand.name, subfactories.deferred),
+                                requested)
+      print_tree(graph, demand.name, requested / copies,
+                 subfactories.inflow[demand.name].refcount,
+                 subfactories.deferred, output, logistics, max_depth,
+                 expand_all, copies)
+
+    output.write("\n## Totals\n")
+    print_totals(graph, totals, output, logistics)
+
+
+def run(args: list[str],
+        graph: RecipeGraph,
+        demands: list[Demand],
+        logistics: Logistics,
+        modules: list[Module] = [],
+        load_seconds: float = 0):
+  global PROFILE
+  parser = argparse.ArgumentParser()
+  parser.add_argument('output', nargs='?', help='Report file (default stdout)')
+  parser.add_argument('--solver',
+                      choices=['tree', 'matrix'],
+                      default='tree',
+                      help='matrix honours side outputs and recipe cycles')
+  parser.add_argument('--format',
+                      choices=['text', 'json', 'csv'],
+                      default='text',
+                      help='json has trees and totals, csv only totals')
+  parser.add_argument('--sweep',
+                      metavar='RATES_CSV',
+                      help='Write totals for each row of demand rates as .npz')
+  parser.add_argument('--exact',
+                      action='store_true',
+                      help='Solve trees in exact fractions rather than floats')
+  parser.add_argument('--jobs',
+                      type=int,
+                      help='Worker processes for the tree solver, --sweep'
+                      ' and --serve (0 for one per CPU; default 1, or one per'
+                      ' CPU for --serve)')
+  parser.add_argument('--belt',
+                      choices=list(logistics.belts) or None,
+                      help='Belt tier to carry items on')
+  parser.add_argument('--depth',
+                      type=int,
+                      help='Stop expanding trees below this depth')
+  parser.add_argument('--expand-all',
+                      action='store_true',
+                      help='Expand repeated subtrees instead of referring back')
+  parser.add_argument('--loadouts',
+                      action='store_true',
+                      help='Search module and beacon loadouts instead')
+  parser.add_argument('--minimize',
+                      choices=['raw', 'buildings', 'power'],
+                      help='Pick alternate recipes by linear programming')
+  parser.add_argument('--round',
+                      type=float,
+                      nargs='?',
+                      const=0.1,
+                      metavar='OVERSHOOT',
+                      help='Whole buildings, and the smallest scale of the '
+                      'demands up to 1 + OVERSHOOT (default 0.1) that takes '
+                      'the fewest per unit of output')
+  parser.add_argument('--simulate',
+                      type=float,
+                      nargs='?',
+                      const=3600,
+                      metavar='SECONDS',
+                      help='Run the factory from empty for SECONDS (default '
+                      '3600) and report buffers and time to steady state')
+  parser.add_argument('--sensitivity',
+                      choices=['buildings', 'raws', 'power'],
+                      nargs='?',
+                      const='buildings',
+                      help='Rank how 1%% more of each demand or building '
+                      'stat changes the totals (default by buildings)')
+  parser.add_argument('--diff',
+                      metavar='PACK',
+                      help='Show what changes in each total when solving PACK '
+                      'instead')
+  parser.add_argument('--cap',
+                      action='append',
+                      metavar='ITEM=RATE',
+                      help='Maximize demand output within items/sec caps')
+  parser.add_argument('--serve',
+                      metavar='ADDRESS',
+                      help='Serve a JSON API on [HOST:]PORT or unix:PATH')
+  parser.add_argument('--profile',
+                      metavar='FILE',
+                      help='Write phase times and expansion counts as .json, '
+                      'or otherwise as folded flamegraph stacks')
+  opts = parser.parse_args(args)
+  jobs = 1 if opts.jobs is None else opts.jobs or None
+  if opts.profile:
+    from instrument import Profile
+    PROFILE = Profile()
+    PROFILE.record(load_seconds, 'load')
+  with phase('validate'):
+    consistent = check_recipes(graph.recipes, graph.raws)
+  assert consistent, "Recipe database is inconsistent"
+  if opts.belt:
+    logistics = logistics.tier(opts.belt)
+  if opts.exact:
+    from exact import exact_graph
+    graph, demands = exact_graph(graph, demands)
+  if opts.serve:
+    from server import serve
+    return serve(graph, demands, opts.serve, opts.jobs or None)
+
+  if opts.sweep:
+    from formats import read_rates, write_npz
+    assert opts.output, "--sweep needs an output file"
+    rates = read_rates(opts.sweep, demands)
+    if jobs == 1:
+      result = sweep(graph, demands, rates)
+    else:
+      from parallel import sweep as parallel_sweep
+      result = parallel_sweep(graph, demands, rates, jobs)
+    write_npz(opts.output, result, demands, rates)
+    return
+
+  if not opts.output:
+    output = stdout
+  else:
+    output = open(opts.output, 'w', encoding='utf-8')
+
+  if opts.loadouts:
+    from loadouts import optimize_loadouts, print_plans
+    with phase('compute'):
+      plans = optimize_loadouts(graph, demands, modules)
+    with phase('render'):
+      output.write("## Pareto-optimal module loadouts\n")
+      print_plans(graph, plans, output)
+  elif opts.simulate is not None:
+    from simulate import print_simulation, simulate
+    with phase('compute'):
+      simulation = simulate(graph, demands, opts.simulate)
+    with phase('render'):
+      print_simulation(simulation, output)
+  elif opts.sensitivity:
+    from sensitivity import print_sensitivities, sensitivities
+    with phase('compute'):
+      result = sensitivities(graph, demands)
+    with phase('render'):
+      print_sensitivities(result, opts.sensitivity, output)
+  elif opts.diff:
+    from diff import diff_plans, print_diff
+    from pack import load_pack
+    with phase('load'):
+      other = load_pack(opts.diff)
+    other_graph, other_demands = other.graph, other.demands
+    if opts.exact:
+      other_graph, other_demands = exact_graph(other_graph, other_demands)
+    with phase('compute'):
+      before, after = diff_plans(graph, demands, other_graph, other_demands)
+    with phase('render'):
+      output.write(f"## Changes with {opts.diff}\n\n")
+      print_diff(before, after, output)
+  elif opts.round is not None:
+    from ratios import print_rounding, round_buildings
+    with phase('compute'):
+      given, best = round_buildings(graph, demands, opts.round)
+    with phase('render'):
+      output.write("## Whole buildings\n")
+      print_rounding(graph, given, best, output)
+  elif opts.cap:
+    from lp import demand_weights, maximize_output
+    caps = {}
+    for cap in opts.cap:
+      name, _, rate = cap.partition('=')
+      caps[name] = float(rate)
+    with phase('compute'):
+      scale, totals, surplus = maximize_output(graph, demands, caps)
+    output.write("## Maximum output\n")
+    for name, weight in demand_weights(demands).items():
+      output.write(f"{scale * weight: 7.2f}/sec {name}\n")
+    output.write("\n## Totals\n")
+    print_totals(graph, totals, output, logistics)
+    if surplus:
+      output.write("\n## Surplus\n")
+      print_surplus(surplus, output)
+  elif opts.minimize:
+    from lp import optimize_recipes, print_alternates
+    with phase('compute'):
+      totals, surplus = optimize_recipes(graph, demands, opts.minimize)
+    output.write(f"## Recipes minimizing {opts.minimize}\n\n## Totals\n")
+    print_totals(graph, totals, output, logistics)
+    output.write("\n## Alternates\n")
+    print_alternates(graph, totals, output)
+    if surplus:
+      output.write("\n## Surplus\n")
+      print_surplus(surplus, output)
+  elif opts.format == 'json':
+    import json
+    from formats import report
+    with phase('compute'):
+      result = report(graph,
+                      demands,
+                      opts.solver,
+                      jobs=jobs,
+                      max_depth=opts.depth,
+                      expand_all=opts.expand_all)
+    with phase('render'):
+      json.dump(result, output)
+  elif opts.format == 'csv':
+    from formats import solve, write_csv
+    with phase('compute'):
+      totals = solve(graph, demands, opts.solver, jobs)[0]
+    with phase('render'):
+      write_csv(graph, totals, output)
+  else:
+    calculate(graph, demands, output, logistics, opts.solver, opts.depth,
+              opts.expand_all, jobs)
+
+  output.close()
+  if PROFILE:
+    PROFILE.save(opts.profile)
+    PROFILE = None
@@ -0,0 +1,109 @@
+import csv
+from typing import Optional, TextIO
+
+from fcalc import (Demand, RecipeGraph, Subfactories, Sweep, Totals,
+                   beacon_count, solve_matrix, tree_json)
+
+TOTALS_HEADER = ('item', 'building', 'buildings', 'power_mw', 'items_per_sec',
+                 'refcount')
+
+
+def totals_json(totals: dict[str, Totals]) -> dict:
+  return {
+      name: {
+          'buildings': float(t.buildings),
+          'items_per_sec': float(t.items_per_sec),
+          'power': float(t.power),
+          'refcount': t.refcount,
+      } for name, t in totals.items()
+  }
+
+
+def subfactories(graph: RecipeGraph, demands: list[Demand],
+                 jobs: Optional[int]) -> Subfactories:
+  if jobs == 1:
+    return Subfactories(graph, demands)
+  from parallel import solve
+  return solve(graph, demands, jobs)
+
+
+def solve(
+    graph: RecipeGraph,
+    demands: list[Demand],
+    solver: str,
+    jobs: Optional[int] = 1) -> tuple[dict[str, Totals], dict[str, float]]:
+  if solver == 'matrix':
+    return solve_matrix(graph, demands)
+  if solver != 'tree':
+    raise ValueError(f"Unknown solver {solver!r}")
+  return subfactories(graph, demands, jobs).totals(), {}
+
+
+def report(graph: RecipeGraph,
+           demands: list[Demand],
+           solver: str = 'tree',
+           trees: bool = True,
+           jobs: Optional[int] = 1,
+           max_depth: Optional[int] = None,
+           expand_all: bool = False) -> dict:
+  # The report as plain data, ready for json.dump.
+  if solver == 'tree':
+    solved = subfactories(graph, demands, jobs)
+    totals, surplus = solved.totals(), {}
+  else:
+    totals, surplus = solve(graph, demands, solver)
+  result = {
+      'totals': totals_json(totals),
+      'power': float(sum(t.power for t in totals.values())),
+      'beacons': float(beacon_count(graph, totals)),
+  }
+  if surplus:
+    result['surplus'] = surplus
+  if trees and solver == 'tree':
+    result['trees'] = [
+        tree_json(graph, d.name, solved.requested[d.name], solved.deferred,
+                  max_depth, expand_all) for d in demands
+    ]
+  return result
+
+
+def write_csv(graph: RecipeGraph, totals: dict[str, Totals], output: TextIO):
+  writer = csv.writer(output)
+  writer.writerow(TOTALS_HEADER)
+  for name, t in sorted(totals.items()):
+    building = (graph.recipes[name].building.name
+                if name in graph.recipes else 'raw')
+    writer.writerow((name, building, float(t.buildings), float(t.power),
+                     float(t.items_per_sec), t.refcount))
+
+
+def read_rates(path: str, demands: list[Demand]):
+  # One scenario per row, with a header naming the demands it sets; the
+  # others keep their own rate.
+  import numpy as np
+
+  with open(path, newline='', encoding='utf-8') as f:
+    rows = list(csv.reader(f))
+  column = {d.name: k for k, d in enumerate(demands)}
+  for name in rows[0]:
+    if name not in column:
+      raise ValueError(f"{path}: {name!r} is not a demand")
+  rates = np.tile([d.min_items_per_second for d in demands],
+                  (len(rows) - 1, 1))
+  for scenario, row in enumerate(rows[1:]):
+    for name, rate in zip(rows[0], row):
+      rates[scenario, column[name]] = float(rate)
+  return rates
+
+
+def write_npz(path: str, result: Sweep, demands: list[Demand], rates):
+  # Plain arrays only, so np.load needs no pickle.
+  import numpy as np
+
+  np.savez(path,
+           demands=np.array([d.name for d in demands]),
+           rates=rates,
+           items=np.array(result.names),
+           items_per_sec=result.items_per_sec,
+           buildings=result.buildings,
+           power=result.power)
@@ -0,0 +1,80 @@
+import json
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, TextIO
+
+from fcalc import RecipeGraph, Unit
+
+
+class Profile:
+  # Collected while fcalc.PROFILE is set: inclusive seconds per stack of
+  # phases and items, how often each item was expanded and rendered, and the
+  # deepest tree line.
+
+  def __init__(self):
+    self.seconds: dict[tuple[str, ...], float] = {}
+    self.stack: list[str] = []
+    self.expansions: Counter[str] = Counter()
+    self.visits: Counter[str] = Counter()
+    self.peak_depth = 0
+
+  @contextmanager
+  def phase(self, name: str):
+    self.stack.append(name)
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      self.stack.pop()
+      self.record(perf_counter() - start, name)
+
+  def record(self, seconds: float, name: str):
+    key = tuple(self.stack) + (name,)
+    self.seconds[key] = self.seconds.get(key, 0) + seconds
+
+  def expanded(self, graph: RecipeGraph, root: int, unit: Unit,
+               seconds: float):
+    self.record(seconds, graph.names[root])
+    self.expansions.update(graph.names[item] for item in unit.ids)
+
+  def traced(self, graph: RecipeGraph,
+             visit: Callable[[int, float, int], None]):
+    names = graph.names
+
+    def traced_visit(item: int, items_per_sec: float, depth: int):
+      self.visits[names[item]] += 1
+      if depth > self.peak_depth:
+        self.peak_depth = depth
+      visit(item, items_per_sec, depth)
+
+    return traced_visit
+
+  def summary(self) -> dict:
+    return {
+        'phases': {
+            key[0]: seconds
+            for key, seconds in self.seconds.items()
+            if len(key) == 1
+        },
+        'expansions': dict(self.expansions.most_common()),
+        'visits': dict(self.visits.most_common()),
+        'peak_depth': self.peak_depth,
+    }
+
+  def write_folded(self, output: TextIO):
+    # One 'frame;frame weight' line per stack, weighted by self time in
+    # microseconds, as flamegraph.pl and speedscope read them.
+    children: dict[tuple[str, ...], float] = {}
+    for key, seconds in self.seconds.items():
+      children[key[:-1]] = children.get(key[:-1], 0) + seconds
+    for key, seconds in sorted(self.seconds.items()):
+      own = seconds - children.get(key, 0)
+      output.write(f"{';'.join(key)} {max(round(own * 1e6), 0)}\n")
+
+  def save(self, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+      if path.endswith('.json'):
+        json.dump(self.summary(), f, indent=2)
+      else:
+        self.write_folded(f)
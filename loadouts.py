@@ -0,0 +1,173 @@
+from collections import Counter
+from itertools import combinations_with_replacement
+from typing import Callable, Iterable, NamedTuple, Optional, TextIO, TypeVar
+
+from fcalc import (Building, Demand, ModdedBuilding, Module, Recipe,
+                   RecipeGraph, Subfactories, Totals, beacon_count)
+
+SUBSCRIPT = str.maketrans('0123456789', '₀₁₂₃₄₅₆₇₈₉')
+
+T = TypeVar('T')
+
+
+
+def loadout_name(building: Building, modules: list[Module],
+                 beacon_modules: list[Module]) -> str:
+
+  def tier(name: str) -> str:
+    return ''.join(c for c in name if c.isdigit()).translate(SUBSCRIPT)
+
+  def code(modules: list[Module]) -> str:
+    counts = Counter(m.name for m in modules)
+    return ''.join(
+        f"{count}{name[0]}{tier(name)}" for name, count in counts.items())
+
+  name = f"{building.name}:{code(modules)}"
+  if beacon_modules:
+    name += f"☸{code(beacon_modules)}"
+  return name
+
+
+def pareto(candidates: Iterable[T], key: Callable[[T], tuple]) -> list[T]:
+  # After a lexicographic sort nothing can dominate an earlier candidate, so
+  # each one only needs checking against the front kept so far.
+  front: list[tuple[tuple, T]] = []
+  for k, candidate in sorted(((key(c), c) for c in candidates),
+                             key=lambda kc: kc[0]):
+    if not any(all(a <= b for a, b in zip(f, k)) for f, _ in front):
+      front.append((k, candidate))
+  return [c for _, c in front]
+
+
+class Loadout(NamedTuple):
+  building: Building
+  # Per item/sec of the recipe's output.
+  buildings: float
+  power: float  # MW.
+  input_factor: float  # Inputs are divided by productivity.
+
+
+def recipe_loadouts(recipe: Recipe, modules: list[Module],
+                    beacon_modules: list[Module], beacon_counts: Iterable[int],
+                    productivity: bool) -> list[Loadout]:
+  base = getattr(recipe.building, 'building', recipe.building)
+  fills: Iterable[tuple] = [()]
+  beacons: list[list[Module]] = [[]]
+  if base.slots:
+    # Loadouts are multisets, so each symmetric fill is only built once.
+    candidates = [m for m in modules if productivity or m.productivity <= 0]
+    fills = combinations_with_replacement(candidates + [None], base.slots)
+    beacons += [[m] * count for count in beacon_counts if count
+                for m in beacon_modules]
+  options = []
+  for fill in fills:
+    installed = [m for m in fill if m is not None]
+    for beacon in beacons:
+      building = (ModdedBuilding(loadout_name(base, installed, beacon), base,
+                                 installed, beacon)
+                  if installed or beacon else base)
+      if building.crafting_speed <= 0:
+        continue
+      per_building_per_sec = (recipe.output_qty / recipe.time.total_seconds() *
+                              building.crafting_speed * building.productivity)
+      options.append(
+          Loadout(building, (1 + building.beacons) / per_building_per_sec,
+                  building.power / per_building_per_sec,
+                  1 / building.productivity))
+  # A loadout that is no better per unit in any respect can't be part of a
+  # better factory, since every total grows with these per-unit costs. The
+  # beacons count against it, or every fill would take the most of them.
+  return pareto(options, key=lambda l: (l.buildings, l.power, l.input_factor))
+
+
+class Plan(NamedTuple):
+  buildings: float
+  power: float  # MW.
+  raw: float  # Items/sec of raws.
+  choices: dict[str, Building]
+  totals: dict[str, Totals]
+
+
+def evaluate_plan(graph: RecipeGraph, demands: list[Demand],
+                  choices: dict[str, Building]) -> Plan:
+  recipes = {
+      name: r._replace(building=choices[name]) if name in choices else r
+      for name, r in graph.recipes.items()
+  }
+  graph = RecipeGraph(recipes, graph.raws)
+  totals = Subfactories(graph, demands).totals()
+  return Plan(
+      sum(t.buildings for t in totals.values()) + beacon_count(graph, totals),
+      sum(t.power for t in totals.values()),
+      sum(t.items_per_sec for name, t in totals.items() if name in graph.raws),
+      choices, totals)
+
+
+def optimize_loadouts(
+    graph: RecipeGraph,
+    demands: list[Demand],
+    modules: list[Module],
+    beacon_counts: Iterable[int] = (0, 8, 16),
+    productivity_allowed: Optional[Callable[[Recipe], bool]] = None,
+    steps: int = 10) -> list[Plan]:
+  # Productivity modules aren't legal on every recipe, so by default they're
+  # only considered where the pack already uses productivity.
+  if productivity_allowed is None:
+    productivity_allowed = lambda r: r.building.productivity > 1
+  graph.refresh()
+  beacon_modules = [
+      m for m in modules if m.crafting_speed > 0 and m.productivity <= 0
+  ]
+  options = [
+      recipe_loadouts(c.recipe, modules, beacon_modules, beacon_counts,
+                      productivity_allowed(c.recipe))
+      for c in graph.compiled[:graph.recipe_count]
+  ]
+
+  # Objectives are scaled by the current factory so the weights are relative.
+  current = evaluate_plan(graph, demands, {})
+  scale = [current.buildings or 1, current.power or 1, current.raw or 1]
+  plans: dict[tuple[str, ...], Plan] = {}
+  for i in range(steps + 1):
+    for j in range(steps + 1 - i):
+      # Keep every weight positive so weakly dominated plans aren't chosen.
+      weights = [(w + 1e-3) / s for w, s in zip((i, j, steps - i - j), scale)]
+      choices = cheapest_loadouts(graph, options, *weights)
+      key = tuple(b.name for b in choices.values())
+      if key not in plans:
+        plans[key] = evaluate_plan(graph, demands, choices)
+  return pareto([current] + list(plans.values()),
+                key=lambda p: (p.buildings, p.power, p.raw))
+
+
+def cheapest_loadouts(graph: RecipeGraph, options: list[list[Loadout]],
+                      building_weight: float, power_weight: float,
+                      raw_weight: float) -> dict[str, Building]:
+  # With fixed weights the cost of an item/sec is linear, so the best loadout
+  # for every recipe follows from one pass from the raws upwards.
+  cost = [0.] * len(graph.names)
+  choices: dict[str, Building] = {}
+  for item in reversed(graph.order):
+    compiled = graph.compiled[item]
+    if compiled is None:
+      cost[item] = raw_weight
+      continue
+    inputs = compiled.recipe.building.productivity * sum(
+        c * cost[i] for i, c in zip(compiled.inputs, compiled.coefficients))
+    best = min(options[item],
+               key=lambda l: building_weight * l.buildings + power_weight * l.
+               power + l.input_factor * inputs)
+    cost[item] = (building_weight * best.buildings + power_weight * best.power +
+                  best.input_factor * inputs)
+    choices[graph.names[item]] = best.building
+  return choices
+
+
+def print_plans(graph: RecipeGraph, plans: list[Plan], output: TextIO):
+  for plan in plans:
+    output.write(f"\n{plan.buildings: 7.1f}🏭 {plan.power: 8.2f}MW "
+                 f"{plan.raw: 8.2f}/sec raw\n")
+    for name, building in sorted(plan.choices.items()):
+      current = graph.recipes[name].building.name
+      if building.name != current and plan.totals.get(name, Totals()).buildings:
+        output.write(f"  {name} ({current} → {building.name})\n")
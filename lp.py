@@ -0,0 +1,169 @@
+from collections import defaultdict
+from typing import TextIO
+
+from fcalc import Demand, RecipeGraph, Totals, recipe_matrix
+
+COSTS = ('raw', 'buildings', 'power')
+
+
+def recipe_product(name: str) -> str:
+  # Alternates are named after what they make, e.g. 'wood (fertilized)'.
+  return name.split(' (', 1)[0]
+
+
+def recipe_products(graph: RecipeGraph) -> list[int]:
+  n = graph.recipe_count
+  products = []
+  for j, name in enumerate(graph.names[:n]):
+    # An alternate for an item nobody else makes stands on its own.
+    product = graph.ids.get(recipe_product(name), j)
+    products.append(product if product < n else j)
+  return products
+
+
+def item_matrix(graph: RecipeGraph):
+  import numpy as np
+
+  graph.refresh()
+  m = recipe_matrix(graph, recipe_products(graph))
+  a = np.zeros((len(graph.names), graph.recipe_count))
+  np.add.at(a, (np.asarray(m.rows), np.asarray(m.cols)), np.asarray(m.values))
+  raws = np.array([name in graph.raws for name in graph.names])
+  return a, raws
+
+
+def optimize_recipes(
+    graph: RecipeGraph,
+    demands: list[Demand],
+    cost: str = 'raw') -> tuple[dict[str, Totals], dict[str, float]]:
+  import numpy as np
+  from scipy.optimize import linprog
+
+  a, raws = item_matrix(graph)
+  n = graph.recipe_count
+  produced_by, consumed_by = np.maximum(a, 0), np.maximum(-a, 0)
+
+  # Only raw consumption is costed; crediting raw by-products could make a
+  # recipe pay for itself and leave the LP unbounded.
+  if cost == 'raw':
+    c = consumed_by[raws].sum(axis=0)
+  elif cost == 'buildings':
+    c = np.ones(n)
+  elif cost == 'power':
+    c = np.array([r.recipe.building.power for r in graph.compiled[:n]])
+  else:
+    raise ValueError(f"Unknown cost {cost!r}, expected one of {COSTS}")
+
+  # Every crafted item must be made at least as fast as it is consumed, and
+  # demands are floors on production, as in the tree solver.
+  floors = np.zeros(len(graph.names))
+  for d in demands:
+    floors[graph.ids[d.name]] = max(floors[graph.ids[d.name]],
+                                    d.min_items_per_second)
+  balanced = np.flatnonzero(~raws)
+  floored = np.flatnonzero((floors > 0) & ~raws)
+  result = linprog(c,
+                   A_ub=np.vstack([-a[balanced], -produced_by[floored]]),
+                   b_ub=np.concatenate([np.zeros(len(balanced)),
+                                        -floors[floored]]),
+                   bounds=(0, None),
+                   method='highs')
+  if result.status != 0:
+    raise ValueError(f"Recipe selection failed: {result.message}")
+  return solution_totals(graph, a, raws, result.x, floors)
+
+
+def solution_totals(graph: RecipeGraph, a, raws, x,
+                    floors) -> tuple[dict[str, Totals], dict[str, float]]:
+  import numpy as np
+
+  produced, consumed = np.maximum(a, 0) @ x, np.maximum(-a, 0) @ x
+  used = np.maximum(consumed, floors)
+  totals: dict[str, Totals] = {}
+  surplus: dict[str, float] = {}
+  for j in np.flatnonzero(x > 1e-9):
+    recipe = graph.compiled[j]
+    totals[graph.names[j]] = Totals(
+        buildings=x[j],
+        items_per_sec=x[j] * recipe.per_building_per_sec,
+        power=x[j] * recipe.recipe.building.power)
+  for i, name in enumerate(graph.names):
+    if raws[i] and used[i] - produced[i] > 1e-9:
+      totals[name] = Totals(items_per_sec=used[i] - produced[i])
+    elif produced[i] - used[i] > 1e-9:
+      surplus[name] = produced[i] - used[i]
+  return totals, surplus
+
+
+def demand_weights(demands: list[Demand]) -> dict[str, float]:
+  weights: dict[str, float] = {}
+  rated = any(d.min_items_per_second for d in demands)
+  for d in demands:
+    if d.min_items_per_second or not rated:
+      weights[d.name] = weights.get(d.name, 0) + (d.min_items_per_second or 1)
+  return weights
+
+
+def maximize_output(
+    graph: RecipeGraph, demands: list[Demand], caps: dict[str, float]
+) -> tuple[float, dict[str, Totals], dict[str, float]]:
+  import numpy as np
+  from scipy.optimize import linprog
+
+  # Demands are made in proportion to their rates and the scale of that
+  # bundle is maximised; demands without a rate only mark subfactories,
+  # unless none has one and they are all made at 1/sec. Caps bound the net
+  # draw of a raw, or the production of a crafted item such as a mined ore.
+  a, raws = item_matrix(graph)
+  n = graph.recipe_count
+  produced_by = np.maximum(a, 0)
+  weights = np.zeros(len(graph.names))
+  for name, weight in demand_weights(demands).items():
+    weights[graph.ids[name]] += weight
+  for name in caps:
+    if name not in graph.ids:
+      raise ValueError(f"Cap on unknown item {name!r}")
+  capped = [(graph.ids[name], cap) for name, cap in caps.items()]
+
+  # Variables are buildings per recipe followed by the scale. Every crafted
+  # item must be made as fast as it is consumed.
+  balanced = np.flatnonzero(~raws)
+  wanted = np.flatnonzero((weights > 0) & ~raws)
+  rows = [np.hstack([-a[balanced], np.zeros((len(balanced), 1))])]
+  rows.append(np.hstack([-produced_by[wanted], weights[wanted, None]]))
+  bounds = [np.zeros(len(balanced)), np.zeros(len(wanted))]
+  for i, cap in capped:
+    # A demanded raw comes straight out of its cap.
+    row = (np.append(-a[i], weights[i])
+           if raws[i] else np.append(produced_by[i], 0))
+    rows.append(row[None])
+    bounds.append([cap])
+  # The scale dominates; the small building cost only breaks ties.
+  c = np.append(np.full(n, 1e-6), -1)
+  result = linprog(c,
+                   A_ub=np.vstack(rows),
+                   b_ub=np.concatenate(bounds),
+                   bounds=(0, None),
+                   method='highs')
+  if result.status == 3:
+    raise ValueError("Output is unbounded; cap a raw the demands need")
+  if result.status != 0:
+    raise ValueError(f"Maximizing output failed: {result.message}")
+  scale, x = result.x[n], result.x[:n]
+  totals, surplus = solution_totals(graph, a, raws, x, weights * scale)
+  return scale, totals, surplus
+
+
+def print_alternates(graph: RecipeGraph, totals: dict[str, Totals],
+                     output: TextIO):
+  alternates: dict[str, list[str]] = defaultdict(list)
+  for name in graph.names[:graph.recipe_count]:
+    alternates[recipe_product(name)].append(name)
+  for product, names in sorted(alternates.items()):
+    made = sum(totals[n].items_per_sec for n in names if n in totals)
+    if len(names) < 2 or not made:
+      continue
+    output.write(f"{product}:\n")
+    for name in names:
+      share = totals[name].items_per_sec / made if name in totals else 0
+      output.write(f"  {share: 7.1%} {name}\n")
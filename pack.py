@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import tomllib
+from glob import escape, glob
+from sys import argv
+from time import perf_counter
+from typing import NamedTuple
+
+import fcalc
+from fcalc import (Building, Demand, Ingredient, Logistics, ModdedBuilding,
+                   Module, Recipe, RecipeGraph, check_recipes, run, secs)
+
+PACKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packs')
+# The sources that turn a pack into its pickle.
+ENGINE = [
+    fcalc.__file__,
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataraw.py'),
+]
+
+
+class Pack(NamedTuple):
+  graph: RecipeGraph
+  demands: list[Demand]
+  modules: list[Module]  # Candidates for the loadout search.
+  logistics: Logistics
+
+
+def parse_pack(data: dict) -> Pack:
+  modules = {
+      name: Module(name, **fields)
+      for name, fields in data.get('modules', {}).items()
+  }
+
+  def fill(counts: dict[str, int]) -> list[Module]:
+    return [
+        modules[name] for name, count in counts.items() for _ in range(count)
+    ]
+
+  # Modded buildings refer to a building listed before them.
+  buildings: dict[str, Building] = {}
+  for name, fields in data['buildings'].items():
+    if 'building' in fields:
+      buildings[name] = ModdedBuilding(name, buildings[fields['building']],
+                                       fill(fields.get('modules', {})),
+                                       fill(fields.get('beacon_modules', {})))
+    else:
+      buildings[name] = Building(name, **fields)
+
+  recipes: dict[str, Recipe] = {}
+  for r in data['recipes']:
+    if r['name'] in recipes:
+      print(f"WARNING: duplicate recipe for {r['name']}")
+    recipes[r['name']] = Recipe(
+        r['name'], buildings[r['building']], r['output_qty'], secs(r['time']),
+        [Ingredient(n, qty) for n, qty in r['ingredients'].items()],
+        [Ingredient(n, qty) for n, qty in r.get('side_outputs', {}).items()])
+  raws = set(data['raws'])
+  if not check_recipes(recipes, raws):
+    raise ValueError("Recipe database is inconsistent")
+
+  graph = RecipeGraph(recipes, raws)
+  try:
+    graph.rank
+  except ValueError:
+    pass  # Cycles are left to the matrix solver.
+  # Older packs only give the capacity of a lane.
+  logistics = Logistics(data.get('lane_capacity', 7.5),
+                        data.get('pipe_capacity', 1200),
+                        frozenset(data.get('fluids', [])),
+                        data.get('belts', {}))
+  if 'belt' in data:
+    logistics = logistics.tier(data['belt'])
+  return Pack(graph,
+              [Demand(n, rate) for n, rate in data.get('demands', {}).items()],
+              [modules[name] for name in data.get('search_modules', [])],
+              logistics)
+
+
+def stamp(path: str) -> tuple[int, int]:
+  st = os.stat(path)
+  return st.st_size, st.st_mtime_ns
+
+
+def read_pack(path: str, source: bytes) -> tuple[dict, list[str]]:
+  # Returns the pack's fields and the other files they were read from.
+  if path.endswith('.toml'):
+    data = tomllib.loads(source.decode('utf-8'))
+  else:
+    data = json.loads(source)
+  if 'data_raw' not in data:
+    return data, []
+
+  # A pack may build on a Factorio data-raw dump, adding demands, buildings
+  # and recipes of its own or replacing the imported ones.
+  from dataraw import import_data_raw
+  dump = os.path.join(os.path.dirname(path), data['data_raw'])
+  imported = import_data_raw(dump, data.get('difficulty', 'normal'),
+                             data.get('category_buildings', {}))
+  own = {r['name'] for r in data.get('recipes', [])}
+  return {
+      **data,
+      'modules': {**imported['modules'], **data.get('modules', {})},
+      'buildings': {**imported['buildings'], **data.get('buildings', {})},
+      'raws': sorted(set(imported['raws']).union(data.get('raws', []))),
+      'fluids': sorted(set(imported['fluids']).union(data.get('fluids', []))),
+      'recipes': [r for r in imported['recipes'] if r['name'] not in own] +
+                 data.get('recipes', []),
+  }, [dump]
+
+
+def load_pack(path: str) -> Pack:
+  # Packs compile to a pickle next to them, keyed by the pack and the engine
+  # sources that compiled it, so a warm start only maps and unpickles one
+  # file. Files the pack pulls in are checked by size and modification time.
+  with open(path, 'rb') as f:
+    source = f.read()
+  digest = hashlib.sha256(source)
+  for engine in ENGINE:
+    with open(engine, 'rb') as f:
+      digest.update(f.read())
+  stem = os.path.splitext(os.path.basename(path))[0]
+  cache_dir = os.path.join(os.path.dirname(path), '__pycache__')
+  cache = os.path.join(cache_dir, f"{stem}.{digest.hexdigest()[:16]}.pickle")
+  try:
+    with open(cache, 'rb') as f, mmap.mmap(f.fileno(), 0,
+                                           access=mmap.ACCESS_READ) as m:
+      stamps, pack = pickle.loads(m)
+    if all(stamp(p) == s for p, s in stamps):
+      return pack
+  except Exception:
+    pass  # Missing or unreadable; rebuild it.
+
+  data, dependencies = read_pack(path, source)
+  stamps = [(p, stamp(p)) for p in dependencies]
+  pack = parse_pack(data)
+  try:
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob(os.path.join(cache_dir, f"{escape(stem)}.*.pickle")):
+      os.remove(stale)
+    with open(cache + '.tmp', 'wb') as f:
+      pickle.dump((stamps, pack), f, pickle.HIGHEST_PROTOCOL)
+    os.replace(cache + '.tmp', cache)
+  except OSError:
+    pass  # A read-only tree just runs uncached.
+  return pack
+
+
+def run_pack(path: str, args: list[str]):
+  start = perf_counter()
+  pack = load_pack(path)
+  run(args, pack.graph, pack.demands, pack.logistics, pack.modules,
+      perf_counter() - start)
+
+
+if __name__ == "__main__":
+  run_pack(argv[1], argv[2:])
@@ -0,0 +1,137 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Optional
+
+import fcalc
+from fcalc import Demand, RecipeGraph, Subfactories, Sweep, Totals
+
+# The graph each worker unpickled from shared memory when it started.
+GRAPH: Optional[RecipeGraph] = None
+
+
+def attach(name: str, size: int):
+  global GRAPH
+  memory = shared_memory.SharedMemory(name)
+  try:
+    with memory.buf[:size] as view:
+      GRAPH = pickle.loads(view)
+  finally:
+    memory.close()
+
+
+@contextmanager
+def pool(graph: RecipeGraph, jobs: Optional[int]):
+  # The compiled graph is pickled into shared memory once and each worker
+  # loads it as it starts, so tasks only carry demands and rates.
+  data = pickle.dumps(graph, pickle.HIGHEST_PROTOCOL)
+  memory = shared_memory.SharedMemory(create=True, size=len(data))
+  try:
+    memory.buf[:len(data)] = data
+    with ProcessPoolExecutor(jobs,
+                             initializer=attach,
+                             initargs=(memory.name, len(data))) as executor:
+      yield executor
+  finally:
+    memory.close()
+    memory.unlink()
+
+
+def components(graph: RecipeGraph,
+               demands: list[Demand]) -> list[list[Demand]]:
+  # Demands whose subfactories request from each other, directly or through
+  # a third, have to settle together. Finding them only walks the recipes
+  # reachable from each demand, stopping at the other demands.
+  stop = set(graph.ids[d.name] for d in demands)
+  parent = {graph.ids[d.name]: graph.ids[d.name] for d in demands}
+
+  def find(item: int) -> int:
+    while parent[item] != item:
+      parent[item] = item = parent[parent[item]]
+    return item
+
+  for root in parent:
+    seen = {root}
+    stack = [root]
+    while stack:
+      recipe = graph.compiled[stack.pop()]
+      if recipe is None:
+        continue
+      for item in recipe.inputs:
+        if item in seen:
+          continue
+        seen.add(item)
+        if item in stop:
+          parent[find(item)] = find(root)
+        else:
+          stack.append(item)
+
+  groups: dict[int, list[Demand]] = {}
+  for d in demands:
+    groups.setdefault(find(graph.ids[d.name]), []).append(d)
+  return list(groups.values())
+
+
+def settle(demands: list[Demand]):
+  subfactories = Subfactories(GRAPH, demands)
+  return (subfactories.requested, subfactories.inflow,
+          subfactories.contributions)
+
+
+class Merged(Subfactories):
+  # Subfactories whose components were settled separately. Contributions are
+  # put back in the order a single Subfactories first evaluates them, so the
+  # totals add up exactly as they would have.
+
+  def __init__(self, graph: RecipeGraph, demands: list[Demand], parts):
+    self.graph = graph
+    self.deferred = set(d.name for d in demands)
+    self.floors = {d.name: d.min_items_per_second for d in demands}
+    self.requested: dict[str, float] = {}
+    self.inflow: dict[str, Totals] = {}
+    contributions: dict[str, dict[str, Totals]] = {}
+    for requested, inflow, contribution in parts:
+      self.requested.update(requested)
+      self.inflow.update(inflow)
+      contributions.update(contribution)
+    rank, ids = graph.rank, graph.ids
+    self.contributions = {
+        name: contributions[name]
+        for name in sorted(contributions, key=lambda n: rank[ids[n]])
+    }
+    self.dirty = set()
+
+
+def solve(graph: RecipeGraph, demands: list[Demand],
+          jobs: Optional[int]) -> Subfactories:
+  # jobs=None runs a worker per CPU.
+  graph.refresh()
+  groups = components(graph, demands)
+  if jobs == 1 or len(groups) == 1:
+    return Subfactories(graph, demands)
+  with pool(graph, jobs and min(jobs, len(groups))) as executor:
+    # map keeps the components in order whichever worker finishes first.
+    return Merged(graph, demands, executor.map(settle, groups))
+
+
+def sweep_rows(demands: list[Demand], rates) -> Sweep:
+  return fcalc.sweep(GRAPH, demands, rates)
+
+
+def sweep(graph: RecipeGraph, demands: list[Demand], rates,
+          jobs: Optional[int]) -> Sweep:
+  # Each worker sweeps a contiguous block of scenarios.
+  import numpy as np
+
+  rates = np.asarray(rates, dtype=float)
+  if jobs == 1 or len(rates) < 2:
+    return fcalc.sweep(graph, demands, rates)
+  graph.refresh()
+  blocks = np.array_split(rates, min(len(rates), 4 * (jobs or os.cpu_count())))
+  with pool(graph, jobs) as executor:
+    parts = list(executor.map(sweep_rows, [demands] * len(blocks), blocks))
+  return Sweep(parts[0].names,
+               *(np.concatenate([getattr(p, field) for p in parts])
+                 for field in ('items_per_sec', 'buildings', 'power')))
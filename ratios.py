@@ -0,0 +1,84 @@
+import math
+from typing import NamedTuple, TextIO
+
+from fcalc import Demand, RecipeGraph, Subfactories
+
+EPSILON = 1e-9
+
+
+class Rounding(NamedTuple):
+  scale: float  # Of every demand.
+  rates: dict[str, float]  # Items/sec of each demand with a floor.
+  buildings: dict[str, int]
+  idle: float  # Whole buildings less the buildings the rates need.
+
+
+def whole(buildings: float) -> int:
+  return math.ceil(buildings - EPSILON)
+
+
+def round_buildings(graph: RecipeGraph,
+                    demands: list[Demand],
+                    overshoot: float = 0.1) -> tuple[Rounding, Rounding]:
+  # Whole buildings for the demands as given, and for the smallest scale of
+  # all of them, up to 1 + overshoot, that needs the fewest whole buildings
+  # per unit of output. Buildings are counted per item, pooled across
+  # subfactories.
+  #
+  # Every count is linear in the scale, so between the scales where some
+  # item's count is exactly whole the whole counts stay put while the output
+  # grows: only those scales, and the largest allowed, can be best.
+  totals = Subfactories(graph, demands).totals()
+  lines = {
+      name: t.buildings
+      for name, t in totals.items()
+      if t.buildings > EPSILON
+  }
+  needed = sum(lines.values())
+  top = 1 + overshoot
+  scales = {1, top}
+  for buildings in lines.values():
+    for n in range(whole(buildings), math.floor(buildings * top + EPSILON) + 1):
+      scales.add(max(n / buildings, 1))
+
+  def rounding(scale: float) -> Rounding:
+    buildings = {name: whole(scale * b) for name, b in lines.items()}
+    return Rounding(
+        scale, {
+            d.name: scale * d.min_items_per_second
+            for d in demands
+            if d.min_items_per_second
+        }, buildings,
+        sum(buildings.values()) - scale * needed)
+
+  # Smallest first, so a larger scale has to do strictly better.
+  best, cost = 1, sum(whole(b) for b in lines.values())
+  for scale in sorted(scales):
+    per_output = sum(whole(scale * b) for b in lines.values()) / scale
+    if per_output < cost * (1 - EPSILON):
+      best, cost = scale, per_output
+  return rounding(1), rounding(best)
+
+
+def print_rounding(graph: RecipeGraph, given: Rounding, best: Rounding,
+                   output: TextIO):
+  # Plans compare by their buildings for the output as demanded, ×1.
+  for name, rounding in (('As demanded', given),
+                         (f"Fewest per output, ×{float(best.scale):.4f}",
+                          best)):
+    buildings = sum(rounding.buildings.values())
+    idle = float(rounding.idle)
+    output.write(f"\n## {name}: {buildings}🏭, "
+                 f"{buildings / float(rounding.scale):.1f}🏭 per ×1, "
+                 f"{idle:.1f}🏭 idle "
+                 f"({idle / buildings if buildings else 0:.1%})\n")
+    for demand, rate in rounding.rates.items():
+      output.write(f"{float(rate): 7.3f}/sec {demand}\n")
+  output.write("\n## Buildings\n")
+  for name in sorted(best.buildings,
+                     key=lambda n: (graph.recipes[n].building.name, n)):
+    if best.buildings[name] == given.buildings[name]:
+      continue
+    output.write(f"{given.buildings[name]: 4}🏭 → "
+                 f"{best.buildings[name]: 4}🏭 "
+                 f"{name} ({graph.recipes[name].building.name})\n")
@@ -0,0 +1,92 @@
+from typing import NamedTuple, TextIO
+
+from fcalc import Demand, RecipeGraph, Subfactories
+
+
+class Sensitivity(NamedTuple):
+  parameter: str
+  value: float
+  # Change in the factory's totals per unit of the parameter.
+  buildings: float
+  raws: float  # Items/sec of raws.
+  power: float  # MW.
+
+
+def sensitivities(graph: RecipeGraph,
+                  demands: list[Demand]) -> list[Sensitivity]:
+  # The tree solver's totals are linear in the rates once it is known which
+  # demands are held at their floor, so one pass up the graph prices an
+  # extra item/sec of every item, and each demand's floor and each
+  # building's speed and productivity are priced from those. Totals are
+  # summed over items: buildings, raws and power.
+  subfactories = Subfactories(graph, demands)
+  totals = subfactories.totals()
+  ids, names, compiled = graph.ids, graph.names, graph.compiled
+  # What one more item/sec of each item adds, and what it adds when drawn as
+  # an input: load on a subfactory held at its floor only eats its surplus.
+  marginal = [(0, 0, 0)] * len(names)
+  drawn = marginal.copy()
+  bound = set(name for name in subfactories.deferred
+              if subfactories.floors[name] >
+              subfactories.inflow[name].items_per_sec)
+  for item in reversed(graph.order):
+    recipe = compiled[item]
+    if recipe is None:
+      marginal[item] = (0, 1, 0)
+    else:
+      buildings, raws, power = 1 / recipe.per_building_per_sec, 0, recipe.power
+      for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+        b, r, p = drawn[input]
+        buildings += coefficient * b
+        raws += coefficient * r
+        power += coefficient * p
+      marginal[item] = (buildings, raws, power)
+    if names[item] not in bound:
+      drawn[item] = marginal[item]
+
+  result = [
+      Sensitivity(f"{d.name} demand", d.min_items_per_second,
+                  *marginal[ids[d.name]]) for d in demands if d.name in bound
+  ]
+  # Buildings and power per item/sec go as 1/speed and 1/productivity, and
+  # so do inputs with productivity.
+  speed: dict[str, list] = {}
+  productivity: dict[str, list] = {}
+  for name, t in totals.items():
+    item = ids[name]
+    if item >= graph.recipe_count or not t.buildings:
+      continue
+    recipe = compiled[item]
+    building = recipe.recipe.building
+    s = speed.setdefault(building.name, [building.crafting_speed, 0, 0, 0])
+    s[1] -= t.buildings / building.crafting_speed
+    s[3] -= t.power / building.crafting_speed
+    p = productivity.setdefault(building.name,
+                                [building.productivity, 0, 0, 0])
+    p[1] -= t.buildings / building.productivity
+    p[3] -= t.power / building.productivity
+    for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+      flow = coefficient * t.items_per_sec / building.productivity
+      for k, cost in enumerate(drawn[input], 1):
+        p[k] -= flow * cost
+  for stat, changes in (('crafting_speed', speed),
+                        ('productivity', productivity)):
+    for name, (value, *change) in changes.items():
+      result.append(Sensitivity(f"{name} {stat}", value, *change))
+  return result
+
+
+def print_sensitivities(sensitivities: list[Sensitivity], by: str,
+                        output: TextIO):
+  # Changes are for 1% more of each parameter, so they rank across units.
+  fields = ('buildings', 'raws', 'power')
+  rows = [(tuple(float(s.value) / 100 * float(getattr(s, f)) for f in fields),
+           s) for s in sensitivities]
+  column = fields.index(by)
+  output.write(f"## Change in totals for +1%, by {by}\n\n"
+               "      🏭    raw/sec        MW parameter\n")
+  for (buildings, raws, power), s in sorted(
+      rows, key=lambda r: (-abs(r[0][column]), r[1].parameter)):
+    if buildings or raws or power:
+      output.write(f"{buildings: 8.3f} {raws: 10.3f} {power: 9.3f} "
+                   f"{s.parameter} ({float(s.value):g})\n")
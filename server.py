@@ -0,0 +1,158 @@
+import asyncio
+import json
+import signal
+from itertools import islice
+from typing import Optional
+
+import parallel
+from fcalc import Demand, RecipeGraph
+from formats import report
+from parallel import pool
+
+CACHE_SIZE = 1024
+# Unit expansions each worker keeps beyond the pack's own.
+UNIT_CACHE_SIZE = 4096
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+# The units the worker's graph arrived with; those are never evicted.
+PACK_UNITS: Optional[frozenset] = None
+
+
+def parse_demands(demands) -> list[Demand]:
+  # Either {"name": rate, ...} or [["name", rate], ...], in demand order.
+  if isinstance(demands, dict):
+    demands = demands.items()
+  return [Demand(name, float(rate)) for name, rate in demands]
+
+
+def calculate(graph: RecipeGraph, demands: list[Demand],
+              request: dict) -> dict:
+  if not isinstance(request, dict):
+    raise ValueError("Expected a JSON object")
+  if 'demands' in request:
+    demands = parse_demands(request['demands'])
+  for d in demands:
+    if d.name not in graph.ids:
+      raise ValueError(f"Unknown item {d.name!r}")
+  return report(graph, demands, request.get('solver', 'tree'),
+                bool(request.get('trees')))
+
+
+def compute(demands: list[Demand], body: bytes) -> bytes:
+  # Runs in a worker on the graph it loaded from shared memory. Every new
+  # set of demands adds units, so the oldest are dropped past the limit.
+  global PACK_UNITS
+  graph = parallel.GRAPH
+  if PACK_UNITS is None:
+    PACK_UNITS = frozenset(graph.units)
+  request = json.loads(body) if body.strip() else {}
+  response = json.dumps(calculate(graph, demands, request)).encode()
+  extra = len(graph.units) - len(PACK_UNITS) - UNIT_CACHE_SIZE
+  if extra > 0:
+    # Units are added in order, so the first that aren't the pack's are the
+    # oldest.
+    evicted = list(
+        islice((key for key in graph.units if key not in PACK_UNITS), extra))
+    for key in evicted:
+      del graph.units[key]
+  return response
+
+
+class Service:
+  # The event loop only parses HTTP and answers from the encoded responses;
+  # calculations go to worker processes so a slow one holds up no one else.
+
+  def __init__(self, graph: RecipeGraph, demands: list[Demand], executor):
+    self.graph = graph
+    self.demands = demands
+    self.executor = executor
+    self.responses: dict[bytes, bytes] = {}
+
+  async def post(self, body: bytes) -> bytes:
+    # Dashboards poll with the same body, so answer those from the encoding.
+    response = self.responses.get(body)
+    if response is None:
+      response = await asyncio.get_running_loop().run_in_executor(
+          self.executor, compute, self.demands, body)
+      if len(self.responses) >= CACHE_SIZE:
+        del self.responses[next(iter(self.responses))]
+      self.responses[body] = response
+    return response
+
+  def get(self) -> bytes:
+    return json.dumps({
+        'demands': {d.name: d.min_items_per_second for d in self.demands},
+        'items': self.graph.names,
+        'raws': sorted(self.graph.raws),
+    }).encode()
+
+  async def handle(self, reader: asyncio.StreamReader,
+                   writer: asyncio.StreamWriter):
+    # A minimal HTTP/1.1 server with keep-alive; POST / calculates and GET /
+    # describes the pack.
+    try:
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        method, path, version = line.decode('latin-1').split()
+        headers = {}
+        while (header := await reader.readline()) not in (b'\r\n', b'\n', b''):
+          key, _, value = header.decode('latin-1').partition(':')
+          headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+        status = 200
+        try:
+          if path != '/':
+            status, payload = 404, b'{"error": "Not found"}'
+          elif method == 'GET':
+            payload = self.get()
+          else:
+            payload = await self.post(body)
+        except (ValueError, KeyError, TypeError) as e:
+          status, payload = 400, json.dumps({'error': str(e)}).encode()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('connection', '').lower() != 'close')
+        writer.write(
+            (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+             f"Content-Type: application/json\r\n"
+             f"Content-Length: {len(payload)}\r\n"
+             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode() + payload)
+        await writer.drain()
+        if not keep_alive:
+          break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+      pass
+    finally:
+      writer.close()
+
+
+def serve(graph: RecipeGraph, demands: list[Demand], address: str,
+          jobs: Optional[int]):
+  # jobs=None runs a worker per CPU. The unit cache is warmed with the pack's
+  # own demands before the graph is shared with them.
+  calculate(graph, demands, {})
+
+  async def main(service: Service):
+    if address.startswith('unix:'):
+      server = await asyncio.start_unix_server(service.handle, address[5:])
+    else:
+      host, _, port = address.rpartition(':')
+      server = await asyncio.start_server(service.handle, host or 'localhost',
+                                          int(port))
+    # SIGTERM stops serving, so the workers and the shared graph are freed.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                  server.close)
+    async with server:
+      try:
+        await server.serve_forever()
+      except asyncio.CancelledError:
+        pass
+
+  with pool(graph, jobs) as executor:
+    # Start the workers before the event loop takes over signals.
+    executor.submit(int).result()
+    asyncio.run(main(Service(graph, demands, executor)))
@@ -0,0 +1,207 @@
+import math
+from heapq import heappop, heappush
+from typing import NamedTuple, Optional, TextIO
+
+from fcalc import Demand, RecipeGraph, Subfactories
+
+SINK_PERIOD = 1.  # Seconds between draws on the demands.
+# Demands are met from the end of the last window that delivered less than all
+# but TOLERANCE of their rate. Windows are at least WINDOW seconds, and as long as any group takes to
+# make one batch at its planned rate, so a lumpy step is judged on whole
+# batches.
+WINDOW = 60.
+TOLERANCE = 0.01
+EPSILON = 1e-9
+
+
+class ItemStats(NamedTuple):
+  # When it first got ahead of what it is drawn on and its buildings
+  # stopped, or None if they never did.
+  filled: Optional[float]
+  peak: float  # The most of it held at once.
+
+
+class Simulation(NamedTuple):
+  seconds: float
+  window: float  # Seconds deliveries are judged over.
+  # When the last window that went short of a demand ended, or None if no
+  # full window since has met them all.
+  settled: Optional[float]
+  # Items/sec each demand was delivered over the last window, and wanted.
+  delivered: dict[str, tuple[float, float]]
+  items: dict[str, ItemStats]
+  events: int
+
+
+def simulate(graph: RecipeGraph,
+             demands: list[Demand],
+             seconds: float = 3600.) -> Simulation:
+  # Runs the tree solver's factory, rounded up to whole buildings, from
+  # empty. The buildings making an item form a group that crafts in batches:
+  # whenever some of them are free and have inputs at hand, they start
+  # together and what they make lands when the recipe's time is up, so slow
+  # recipes arrive in lumps. A group only starts while it holds less than it
+  # is drawn on during one craft, plus one batch of its own and one of every
+  # group it feeds, as a full output would stop it: a group with no spare
+  # buildings never gets back the time it stands idle. Raws, and anything
+  # the factory doesn't make, are never short.
+  graph.refresh()
+  subfactories = Subfactories(graph, demands)
+  totals = subfactories.totals()
+  ids, names, compiled = graph.ids, graph.names, graph.compiled
+  count: dict[int, int] = {}  # Buildings in each group.
+  craft: dict[int, float] = {}  # What one of them makes in one craft.
+  cycle: dict[int, float] = {}
+  enough: dict[int, float] = {}
+  for name, t in totals.items():
+    item = ids[name]
+    if item >= graph.recipe_count or t.buildings <= EPSILON:
+      continue
+    recipe = compiled[item].recipe
+    cycle[item] = (recipe.time.total_seconds() /
+                   recipe.building.crafting_speed)
+    count[item] = math.ceil(t.buildings - EPSILON)
+    craft[item] = compiled[item].per_building_per_sec * cycle[item]
+    enough[item] = t.items_per_sec * cycle[item] + craft[item] * count[item]
+  # Demands only take what the other subfactories leave of their floor.
+  floors = [(ids[name], (requested - subfactories.inflow[name].items_per_sec) *
+             SINK_PERIOD)
+            for name, requested in subfactories.requested.items()
+            if ids[name] in count]
+  floors = [(demand, want) for demand, want in floors if want > EPSILON]
+  draws = dict(floors)
+  for item in count:
+    recipe = compiled[item]
+    for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+      if input in count:
+        draws[input] = (draws.get(input, 0) +
+                        coefficient * craft[item] * count[item])
+  for item, most in draws.items():
+    enough[item] += most
+  batch = max((max(cycle[item], craft[item] * count[item] /
+                   totals[names[item]].items_per_sec) for item in count),
+              default=0)
+  window = math.ceil(max(WINDOW, batch) / SINK_PERIOD)  # In draws.
+
+  stock = [0.] * len(names)
+  peak = [0.] * len(names)
+  filled: list[Optional[float]] = [None] * len(names)
+  # What each demand had been delivered in all after each draw.
+  delivered: dict[int, list[float]] = {demand: [] for demand, _ in floors}
+  short = {demand: 0. for demand, _ in floors}  # Last short window's end.
+  busy = dict.fromkeys(count, 0)  # Buildings of each group at work.
+  waiting: dict[int, set[int]] = {}
+  full: set[int] = set()
+  # (time, 0, item, buildings) when some of a group finish their craft, or
+  # (time, 1, tick, 0) for the demands' draw, which comes after.
+  queue: list[tuple[float, int, int, int]] = []
+
+  def start(item: int, now: float):
+    if stock[item] >= enough[item]:
+      full.add(item)
+      if filled[item] is None:
+        filled[item] = now
+      return
+    free = count[item] - busy[item]
+    if not free:
+      return  # Starts again as some finish.
+    recipe = compiled[item]
+    buildings = free
+    for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+      if input in count:
+        buildings = min(
+            buildings,
+            math.floor(stock[input] / (coefficient * craft[item]) + EPSILON))
+    if buildings:
+      busy[item] += buildings
+      for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+        if input in count:
+          stock[input] = max(
+              stock[input] - coefficient * craft[item] * buildings, 0)
+      heappush(queue, (now + cycle[item], 0, item, buildings))
+      for input in recipe.inputs:
+        drawn(input, now)
+    if buildings < free:
+      # The rest start as the inputs they ran out of arrive.
+      for input, coefficient in zip(recipe.inputs, recipe.coefficients):
+        if (input in count and
+            stock[input] < coefficient * craft[item] * (1 - EPSILON)):
+          waiting.setdefault(input, set()).add(item)
+
+  def drawn(item: int, now: float):
+    if item in full and stock[item] < enough[item]:
+      full.remove(item)
+      start(item, now)
+
+  def add(item: int, items: float, now: float):
+    stock[item] += items
+    peak[item] = max(peak[item], stock[item])
+    for consumer in sorted(waiting.pop(item, ())):
+      start(consumer, now)
+
+  for item in reversed(graph.order):
+    if item in count:
+      start(item, 0)
+  if floors:
+    heappush(queue, (0, 1, 0, 0))
+  events = 0
+  while queue and queue[0][0] <= seconds:
+    now, kind, item, buildings = heappop(queue)
+    events += 1
+    if kind == 1:
+      for demand, want in floors:
+        cumulative = delivered[demand]
+        taken = min(stock[demand], want)
+        stock[demand] -= taken
+        cumulative.append(taken + (cumulative[-1] if cumulative else 0))
+        drawn(demand, now)
+        if item < window:
+          short[demand] = now
+        elif (cumulative[-1] - cumulative[-1 - window] <
+              (1 - TOLERANCE) * want * window):
+          short[demand] = now
+      heappush(queue, ((item + 1) * SINK_PERIOD, 1, item + 1, 0))
+      continue
+    busy[item] -= buildings
+    recipe = compiled[item]
+    made = craft[item] * buildings
+    for output, coefficient in zip(recipe.side_outputs,
+                                   recipe.side_coefficients):
+      add(output, coefficient * made, now)
+    add(item, made, now)
+    start(item, now)
+
+  settled = max(short.values(), default=0)
+  rates = {}
+  for demand, want in floors:
+    cumulative = [0.] + delivered[demand]
+    span = min(window, len(cumulative) - 1)
+    rates[names[demand]] = ((cumulative[-1] - cumulative[-1 - span]) /
+                            (span * SINK_PERIOD) if span else 0,
+                            want / SINK_PERIOD)
+  return Simulation(
+      seconds, window * SINK_PERIOD,
+      None if settled + window * SINK_PERIOD > seconds else settled, rates, {
+          names[item]: ItemStats(filled[item], peak[item])
+          for item in sorted(count, key=lambda i: names[i])
+      }, events)
+
+
+def print_simulation(simulation: Simulation, output: TextIO):
+  output.write(f"## Simulated {simulation.seconds:g}s, "
+               f"{simulation.events} events: ")
+  if simulation.settled is None:
+    output.write(f"demands not met over a full {simulation.window:g}s window "
+                 f"by the end\n")
+  else:
+    output.write(f"demands met from {simulation.settled:.1f}s\n")
+  output.write(f"\n    /sec    wanted demand, over the last "
+               f"{simulation.window:g}s\n")
+  for name, (delivered, wanted) in simulation.delivered.items():
+    output.write(f"{delivered: 8.3f} {wanted: 9.3f} {name}\n")
+  output.write("\n  filled    buffer item\n")
+  for name, s in sorted(simulation.items.items(),
+                        key=lambda i: (i[1].filled is not None, -(
+                            i[1].filled or 0), i[0])):
+    filled = "never" if s.filled is None else f"{s.filled:.1f}s"
+    output.write(f"{filled:>8} {s.peak: 9.1f} {name}\n")